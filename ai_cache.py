@@ -0,0 +1,249 @@
+"""
+Cache des résultats du modèle IA
+================================
+Deux niveaux :
+- un LRU en mémoire (borné)
+- un store SQLite sur disque qui survit aux redémarrages
+
+Les clés combinent le message normalisé et l'empreinte (sha256) des
+fichiers du modèle : si un .pkl change sur le disque, l'empreinte change
+et le cache est invalidé automatiquement.
+
+Plusieurs process peuvent partager le fichier SQLite avec des modèles
+différents (.pkl, artefact compact) : à l'ouverture, on ne supprime que
+les entrées des autres empreintes plus vieilles que STALE_AFTER_S. Les
+entrées de l'ancien modèle sont supprimées quand ses fichiers changent.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Entrées d'une autre empreinte non réécrites depuis (s) : supprimées à l'ouverture
+STALE_AFTER_S = 7 * 24 * 3600
+
+
+def normalize_cache_key(message):
+    """
+    Normalise un message pour le cache : minuscules + espaces compactés
+    (le vectorizer TF-IDF ignore déjà la casse et les espaces)
+    """
+    return " ".join(message.lower().split())
+
+
+def files_signature(paths):
+    """
+    Signature bon marché des fichiers (taille + date de modification)
+    Sert à détecter un changement sans relire les fichiers
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def files_fingerprint(paths):
+    """
+    Empreinte sha256 du contenu des fichiers du modèle
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8"))
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except FileNotFoundError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    LRU en mémoire devant un store SQLite persistant
+
+    encode / decode convertissent une valeur en texte pour le disque
+    (JSON par défaut). on_invalidate est appelé quand les fichiers du
+    modèle changent, par exemple pour recharger le modèle.
+    """
+
+    def __init__(self, path, model_files, max_entries=1024,
+                 encode=json.dumps, decode=json.loads, on_invalidate=None,
+                 stale_after=STALE_AFTER_S):
+        self.path = path
+        self.model_files = tuple(model_files)
+        self.max_entries = max_entries
+        self.encode = encode
+        self.decode = decode
+        self.on_invalidate = on_invalidate
+        self.stale_after = stale_after
+
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " fingerprint TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " written REAL NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (fingerprint, key))"
+            )
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(results)")]
+            if "written" not in columns:
+                # Ancien schéma : ses entrées comptent comme anciennes
+                self.db.execute("ALTER TABLE results ADD COLUMN written REAL NOT NULL DEFAULT 0")
+            self.db.commit()
+
+        self.signature = files_signature(self.model_files)
+        self.fingerprint = files_fingerprint(self.model_files)
+        self._purge_stale()
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def _purge_stale(self):
+        """
+        Supprime du disque les entrées des autres modèles non réécrites depuis
+        stale_after (celles d'un process qui charge un autre modèle restent)
+        """
+        if self.db is not None:
+            self.db.execute("DELETE FROM results WHERE fingerprint != ? AND written < ?",
+                            (self.fingerprint, time.time() - self.stale_after))
+            self.db.commit()
+
+    def _purge_fingerprint(self, fingerprint):
+        """
+        Supprime du disque les entrées d'un modèle remplacé
+        """
+        if self.db is not None:
+            self.db.execute("DELETE FROM results WHERE fingerprint = ?", (fingerprint,))
+            self.db.commit()
+
+    def check_model_files(self):
+        """
+        Invalide le cache si les fichiers du modèle ont changé
+        Retourne True si une invalidation a eu lieu
+        """
+        signature = files_signature(self.model_files)
+        if signature == self.signature:
+            return False
+
+        with self.lock:
+            if signature == self.signature:
+                return False
+            self.signature = signature
+            fingerprint = files_fingerprint(self.model_files)
+            if fingerprint == self.fingerprint:
+                # Fichiers touchés mais contenu identique
+                return False
+            previous, self.fingerprint = self.fingerprint, fingerprint
+            self.memory.clear()
+            self._purge_fingerprint(previous)
+            self.counters["invalidations"] += 1
+
+        if self.on_invalidate is not None:
+            self.on_invalidate()
+        return True
+
+    # ------------------------------------------------------------------
+    # Lecture / écriture
+    # ------------------------------------------------------------------
+
+    def get(self, key, check=True):
+        """
+        Retourne la valeur en cache ou None
+        check=False : l'appelant a déjà fait check_model_files (une fois par
+        lot plutôt qu'une fois par message)
+        """
+        if check:
+            self.check_model_files()
+
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.counters["hits"] += 1
+                return self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT value FROM results WHERE fingerprint = ? AND key = ?",
+                    (self.fingerprint, key)
+                ).fetchone()
+                if row is not None:
+                    value = self.decode(row[0])
+                    self._remember(key, value)
+                    self.counters["disk_hits"] += 1
+                    return value
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        """
+        Enregistre une valeur dans les deux niveaux
+        """
+        with self.lock:
+            self._remember(key, value)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO results (fingerprint, key, value, written)"
+                    " VALUES (?, ?, ?, ?)",
+                    (self.fingerprint, key, self.encode(value), time.time())
+                )
+                self.db.commit()
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        """
+        Vide les deux niveaux
+        """
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM results")
+                self.db.commit()
+
+    def stats(self):
+        """
+        Compteurs hits / misses / évictions + taille du LRU
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self.memory)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = ((stats["hits"] + stats["disk_hits"]) / lookups
+                              if lookups else 0.0)
+        return stats
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,148 @@
+"""
+Prédiction en masse sur un fichier de prompts (un prompt par ligne)
+===================================================================
+Version batch de test.test_from_file pour les gros volumes :
+- le fichier est lu en streaming, par paquets (mémoire constante)
+- les paquets partent dans un pool de processus ; chaque worker charge
+  le modèle une seule fois et classifie son paquet en un seul appel
+- les résultats sont écrits en JSONL ou CSV dans l'ordre d'entrée
+- le débit (prompts/s) est affiché à la fin
+
+Usage :
+    python batch_predict.py prompts.txt predictions.jsonl
+    python batch_predict.py prompts.txt predictions.csv --workers 8 --chunk-size 1000
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+CHUNK_SIZE = 512
+
+
+def read_prompts(file_path):
+    """
+    Générateur des prompts non vides du fichier (comme test_from_file)
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker():
+    # Un chargement par worker (artefact mmap partagé s'il a été exporté)
+    # Sans cache de résultats (use_cache=False) : ni fichier SQLite ni verrou WAL
+    import model_interface
+    model_interface.RESULT_CACHE = False
+    model_interface.ensure_model_loaded()
+
+
+def _predict_chunk(prompts, top_k):
+    from model_interface import classify_batch
+    results = classify_batch(prompts, top_k=top_k, use_cache=False)
+    return [(result.prediction, result.confidence, result.top_k) for result in results]
+
+
+class _Writer:
+    """
+    Écrit les résultats en JSONL ou CSV
+    """
+
+    def __init__(self, f, fmt):
+        self.f = f
+        self.fmt = fmt
+        if fmt == "csv":
+            self.csv = csv.writer(f)
+            self.csv.writerow(["index", "prompt", "prediction", "confidence"])
+
+    def write(self, index, prompt, prediction, confidence, top_k):
+        if self.fmt == "csv":
+            self.csv.writerow([index, prompt, prediction, f"{confidence:.6f}"])
+        else:
+            self.f.write(json.dumps({
+                "index": index,
+                "prompt": prompt,
+                "prediction": prediction,
+                "confidence": confidence,
+                "top_k": top_k,
+            }, ensure_ascii=False) + "\n")
+
+
+def predict_file(input_path, output_path, workers=None, chunk_size=CHUNK_SIZE,
+                 fmt=None, top_k=3):
+    """
+    Classifie tous les prompts de input_path vers output_path
+    Au plus 2 paquets en vol par worker : la mémoire reste constante
+    Retourne {"prompts", "seconds", "prompts_per_second"}
+    """
+    workers = workers or os.cpu_count() or 1
+    if fmt is None:
+        fmt = "csv" if output_path.endswith(".csv") else "jsonl"
+    max_pending = workers * 2
+
+    start = time.perf_counter()
+    count = 0
+    with open(output_path, "w", encoding="utf-8", newline="") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        writer = _Writer(out, fmt)
+        pending = deque()
+        chunks = iter_chunks(read_prompts(input_path), chunk_size)
+
+        def flush_oldest():
+            nonlocal count
+            prompts, future = pending.popleft()
+            for prompt, (prediction, confidence, top) in zip(prompts, future.result()):
+                writer.write(count, prompt, prediction, confidence, top)
+                count += 1
+
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(_predict_chunk, chunk, top_k)))
+            if len(pending) >= max_pending:
+                flush_oldest()
+        while pending:
+            flush_oldest()
+
+    seconds = time.perf_counter() - start
+    return {
+        "prompts": count,
+        "seconds": seconds,
+        "prompts_per_second": count / seconds if seconds > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prédiction en masse d'un fichier de prompts")
+    parser.add_argument("input", help="un prompt par ligne")
+    parser.add_argument("output", help=".jsonl ou .csv")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"📂 Lecture du fichier : {args.input}")
+    report = predict_file(args.input, args.output, args.workers, args.chunk_size,
+                          args.format, args.top_k)
+    print(f"✅ {report['prompts']} prompts → {args.output}")
+    print(f"⏱️  {report['seconds']:.2f}s — {report['prompts_per_second']:.0f} prompts/s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
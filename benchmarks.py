@@ -0,0 +1,480 @@
+"""
+Benchmarks reproductibles des chemins critiques
+================================================
+Mesure ops/s et latences p50/p99 de :
+- is_similar.is_similar / calculate_typo_score / score_many / damerau_levenshtein_distance
+- respond.detect_category
+- phrase_index.find_phrase_category sur une grosse table de phrases
+- model_interface.call_ai_model (sans cache, sans affichage)
+- render.render_classification (affichage rich, capturé)
+
+Les corpus sont synthétiques et générés avec une graine fixe (mots avec
+typos, salutations courtes, prompts longs de tailles variées).
+
+Usage :
+    python benchmarks.py                          # tout, affiche un tableau
+    python benchmarks.py --quick --only typo      # sous-ensemble rapide
+    python benchmarks.py --save bench.json        # enregistre les résultats
+    python benchmarks.py --baseline bench.json    # compare, exit 1 si régression
+    python benchmarks.py --startup                # budget de démarrage, exit 1 si dépassé
+    python benchmarks.py --hit-rate               # part du trafic gardée par le tier frugal
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+SEED = 1234
+
+# Régression : ops/s en baisse de plus de 25 % par rapport à la baseline
+REGRESSION_THRESHOLD = 0.25
+
+# Démarrage à froid du tier frugal (nouvel interpréteur, interpréteur compris)
+STARTUP_BUDGET_MS = 100
+# Temps d'import cumulé de main.py (python -X importtime)
+STARTUP_IMPORT_BUDGET_MS = 50
+# Modules qui ne doivent pas être importés avant le premier message IA
+STARTUP_FORBIDDEN = ("numpy", "scipy", "sklearn", "joblib", "rich", "readline")
+STARTUP_CODE = "import main; main.route_frugal(main.analyze('hello'))"
+
+# Taille de la table de phrases synthétique (par catégorie)
+PHRASES_PER_CATEGORY = 1000
+
+GREETINGS = [
+    "hi", "hello", "hey there", "thanks", "thank you", "thx", "bye",
+    "see you", "how are you", "how r u", "what's up", "goodbye", "cheers",
+    "yo", "later", "ok", "thanks a lot", "hello friend",
+]
+
+# Corpus du taux de réponse frugale : formules de politesse avec typos et
+# mots autour, et prompts courts qui doivent rester au modèle
+SMALL_TALK_EXTRAS = [
+    "", "", "a lot", "so much", "my friend", "doing", "today", "buddy",
+    "for that", "again", "everyone", "mister", "dude",
+]
+TRICKY_PROMPTS = [
+    "how are the results computed",
+    "see the attached document and summarize it",
+    "thanks to the author, summarize the text",
+    "write a poem about how you feel",
+    "explain what is up quark",
+    "close the door in this story",
+    "exit strategy for a startup essay",
+    "hello world program in python",
+    "later chapters of the book, rewrite them",
+    "how do you solve this equation",
+    "please close this",
+    "close it all now",
+    "exit it please",
+    # Presque une formule de politesse, mais une vraie question
+    "who are you",
+    "how old are you",
+    "where are you",
+    "how are vaccines",
+    "how are prices",
+    "are you there",
+    "sue you",
+    "she you",
+]
+
+PROMPT_WORDS = (
+    "write story poem solve equation explain answer question document "
+    "summarize rewrite paragraph recipe cook ingredients memorize list "
+    "multiple choice option correct math exercise derivative integral "
+    "creative character dialogue constraint exactly words letter rhyme "
+    "according text passage context source cite edit grammar style"
+).split()
+
+
+# ============================================================================
+# CORPUS SYNTHÉTIQUES
+# ============================================================================
+
+def make_typo(word, rng, max_edits=2):
+    """
+    Applique 0 à max_edits fautes (insertion, suppression, substitution, swap)
+    """
+    chars = list(word)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    for _ in range(rng.randint(0, max_edits)):
+        op = rng.randrange(4)
+        pos = rng.randrange(len(chars) + 1)
+        if op == 0:
+            chars.insert(pos, rng.choice(letters))
+        elif op == 1 and len(chars) > 1 and pos < len(chars):
+            del chars[pos]
+        elif op == 2 and pos < len(chars):
+            chars[pos] = rng.choice(letters)
+        elif op == 3 and pos + 1 < len(chars):
+            chars[pos], chars[pos + 1] = chars[pos + 1], chars[pos]
+    return "".join(chars)
+
+
+def build_corpora(seed=SEED, size=200):
+    """
+    Corpus déterministes pour une graine donnée
+    """
+    import respond
+
+    rng = random.Random(seed)
+    keywords = [k for ks in respond.keywords.values() for k in ks if " " not in k]
+
+    typo_pairs = []
+    for _ in range(size):
+        keyword = rng.choice(keywords)
+        typo_pairs.append((make_typo(keyword, rng), rng.choice(keywords)))
+
+    greetings = [" ".join(make_typo(w, rng, 1) for w in rng.choice(GREETINGS).split())
+                 for _ in range(size)]
+
+    prompts = {}
+    for length in (10, 50, 200, 1000):
+        prompts[length] = [" ".join(rng.choice(PROMPT_WORDS) for _ in range(length))
+                           for _ in range(max(size // 10, 5))]
+
+    return {"typo_pairs": typo_pairs, "greetings": greetings, "prompts": prompts}
+
+
+def build_hit_rate_corpora(seed=SEED, size=1000):
+    """
+    (formules de politesse, prompts) : les premières doivent rester au tier
+    frugal, les seconds partir au modèle
+    """
+    import respond
+
+    rng = random.Random(seed)
+    keywords = [k for ks in respond.keywords.values() for k in ks]
+    small_talk = []
+    for _ in range(size):
+        words = [make_typo(word, rng, 1) if len(word) > 2 else word
+                 for word in rng.choice(keywords).split()]
+        extra = rng.choice(SMALL_TALK_EXTRAS).split()
+        words = extra + words if rng.random() < 0.3 else words + extra
+        small_talk.append(" ".join(words))
+
+    prompts = list(TRICKY_PROMPTS)
+    while len(prompts) < size:
+        prompts.append(" ".join(rng.choice(PROMPT_WORDS) for _ in range(rng.randint(3, 8))))
+    return small_talk, prompts
+
+
+def measure_hit_rate(seed=SEED, size=1000):
+    """
+    Part des formules de politesse répondues sans le modèle (et part des
+    prompts gardés à tort), sans puis avec les phrases approchées
+    """
+    import respond
+
+    small_talk, prompts = build_hit_rate_corpora(seed, size)
+    report = {}
+    saved = respond.FUZZY_PHRASES
+    try:
+        for fuzzy in (False, True):
+            respond.FUZZY_PHRASES = fuzzy
+            kept = sum(1 for m in small_talk if respond.detect_category(m))
+            wrong = sum(1 for m in prompts if respond.detect_category(m))
+            report["fuzzy" if fuzzy else "exact"] = {
+                "small_talk_hit_rate": kept / len(small_talk),
+                "prompt_false_rate": wrong / len(prompts),
+                "detect_category": measure(respond.detect_category,
+                                           [(m,) for m in small_talk + prompts]),
+            }
+    finally:
+        respond.FUZZY_PHRASES = saved
+    return report
+
+
+# ============================================================================
+# MESURE
+# ============================================================================
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(func, inputs, repeat=1, warmup=1):
+    """
+    Appelle func(*args) pour chaque args de inputs, repeat fois
+    Retourne ops/s et latences p50/p99 en microsecondes
+    """
+    for args in inputs[:warmup]:
+        func(*args)
+
+    clock = time.perf_counter_ns
+    latencies = []
+    for _ in range(repeat):
+        for args in inputs:
+            start = clock()
+            func(*args)
+            latencies.append(clock() - start)
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "n": len(latencies),
+        "ops_per_s": len(latencies) / (total / 1e9) if total else 0.0,
+        "p50_us": percentile(latencies, 0.50) / 1000,
+        "p99_us": percentile(latencies, 0.99) / 1000,
+    }
+
+
+def benchmark_cases(corpora):
+    """
+    (nom, fonction, inputs, repeat) pour chaque benchmark
+    inputs peut être une fonction (appelée seulement si le cas est lancé)
+    Les imports lourds (modèle) ne se font que pour les cas sélectionnés
+    """
+    import is_similar
+    import respond
+
+    pairs = corpora["typo_pairs"]
+    keywords = [keyword for keyword_list in respond.keywords.values() for keyword in keyword_list]
+
+    # La version de référence lève KeyError sur certaines paires
+    def reference_ok(pair):
+        try:
+            is_similar.damerau_levenshtein_distance(*pair)
+            return True
+        except KeyError:
+            return False
+
+    cases = [
+        ("typo.is_similar", is_similar.is_similar, pairs, 5),
+        ("typo.calculate_typo_score", is_similar.calculate_typo_score, pairs, 2),
+        # Un message entier contre toute la table de keywords, en une fois
+        ("typo.score_many", is_similar.score_many,
+         [([word for word, _ in pairs[i:i + 5]], keywords)
+          for i in range(0, len(pairs), 5)], 2),
+        ("typo.damerau_levenshtein_distance",
+         is_similar.damerau_levenshtein_distance, [p for p in pairs if reference_ok(p)], 2),
+        ("typo.damerau_levenshtein_distance_bounded",
+         is_similar.damerau_levenshtein_distance_bounded, pairs, 2),
+        ("routing.detect_category.greetings", respond.detect_category,
+         [(m,) for m in corpora["greetings"]], 5),
+    ]
+    for length, prompts in corpora["prompts"].items():
+        cases.append((f"routing.detect_category.prompt_{length}w",
+                      respond.detect_category, [(p,) for p in prompts], 5))
+
+    def phrase_inputs():
+        # Index construit avant la mesure : on ne chronomètre que la recherche
+        import phrase_index
+        rng = random.Random(SEED)
+        table = {category: [" ".join(rng.choice(PROMPT_WORDS) for _ in range(3))
+                            for _ in range(PHRASES_PER_CATEGORY)]
+                 for category in respond.keywords}
+        index = phrase_index.build_phrase_index(table)
+        return [(index, message) for message in corpora["greetings"] + corpora["prompts"][10]]
+
+    def find_phrase(index, message):
+        import phrase_index
+        return phrase_index.find_phrase_category(index, message)
+
+    cases.append((f"routing.phrase_index.{PHRASES_PER_CATEGORY}_per_category",
+                  find_phrase, phrase_inputs, 5))
+
+    def call_ai_model_uncached(message):
+        import model_interface
+        return model_interface.call_ai_model(message, use_cache=False)
+
+    for length, prompts in corpora["prompts"].items():
+        cases.append((f"model.call_ai_model.prompt_{length}w",
+                      call_ai_model_uncached, [(p,) for p in prompts], 2))
+
+    def render_quiet(result):
+        import render
+        from rich.console import Console
+        render.render_classification(result, console=Console(file=io.StringIO(), width=100))
+
+    def render_inputs():
+        # Résultats calculés avant la mesure : on ne chronomètre que le rendu
+        import model_interface
+        return [(result,) for result in
+                model_interface.classify_batch(corpora["prompts"][10], use_cache=False)]
+
+    cases.append(("render.render_classification", render_quiet, render_inputs, 2))
+    return cases
+
+
+def run_benchmarks(only=None, quick=False, seed=SEED):
+    """
+    Lance les benchmarks (filtrés par sous-chaîne only) et retourne le rapport
+    """
+    corpora = build_corpora(seed, size=50 if quick else 200)
+    cases = [case for case in benchmark_cases(corpora) if not only or only in case[0]]
+
+    if any(name.startswith(("model.", "render.")) for name, *_ in cases):
+        import model_interface
+        model_interface.ensure_model_loaded()
+
+    results = {}
+    for name, func, inputs, repeat in cases:
+        if callable(inputs):
+            inputs = inputs()
+        results[name] = measure(func, inputs, repeat=1 if quick else repeat)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "quick": quick,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Liste des régressions : (nom, ops/s baseline, ops/s actuel, variation)
+    """
+    regressions = []
+    for name, current in report["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference or not reference["ops_per_s"]:
+            continue
+        change = current["ops_per_s"] / reference["ops_per_s"] - 1
+        if change < -threshold:
+            regressions.append((name, reference["ops_per_s"], current["ops_per_s"], change))
+    return regressions
+
+
+def print_report(report, baseline=None):
+    print(f"{'benchmark':45s} {'ops/s':>12s} {'p50 µs':>10s} {'p99 µs':>10s}  vs baseline")
+    for name, r in report["results"].items():
+        line = f"{name:45s} {r['ops_per_s']:12.1f} {r['p50_us']:10.1f} {r['p99_us']:10.1f}"
+        reference = (baseline or {}).get("results", {}).get(name)
+        if reference and reference["ops_per_s"]:
+            line += f"  {r['ops_per_s'] / reference['ops_per_s'] - 1:+.1%}"
+        print(line)
+
+
+# ============================================================================
+# BUDGET DE DÉMARRAGE
+# ============================================================================
+
+def measure_startup(repeat=5):
+    """
+    Démarrage à froid dans un nouvel interpréteur :
+    - python -X importtime -c "import main" : temps d'import cumulé et
+      modules lourds importés
+    - temps total jusqu'à la première réponse frugale (meilleur de repeat)
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=directory, capture_output=True, text=True, check=True).stderr
+    import_us = 0
+    imported = set()
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        imported.add(name.strip().split(".")[0])
+        # Module de premier niveau : pas d'indentation après le "|"
+        if name == " main":
+            import_us = int(cumulative)
+    
+    first_reply = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", STARTUP_CODE], cwd=directory, check=True)
+        first_reply.append((time.perf_counter() - start) * 1000)
+    
+    return {
+        "import_ms": import_us / 1000,
+        "first_reply_ms": min(first_reply),
+        "heavy_modules": sorted(imported & set(STARTUP_FORBIDDEN)),
+    }
+
+
+def check_startup(startup):
+    """
+    Liste des dépassements du budget de démarrage (vide si tout va bien)
+    """
+    failures = []
+    if startup["first_reply_ms"] > STARTUP_BUDGET_MS:
+        failures.append(f"première réponse frugale en {startup['first_reply_ms']:.0f} ms "
+                        f"(budget {STARTUP_BUDGET_MS} ms)")
+    if startup["import_ms"] > STARTUP_IMPORT_BUDGET_MS:
+        failures.append(f"import de main en {startup['import_ms']:.0f} ms "
+                        f"(budget {STARTUP_IMPORT_BUDGET_MS} ms)")
+    if startup["heavy_modules"]:
+        failures.append(f"modules lourds importés au démarrage : "
+                        f"{', '.join(startup['heavy_modules'])}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks Frugal AI")
+    parser.add_argument("--only", help="ne lancer que les benchmarks contenant ce texte")
+    parser.add_argument("--quick", action="store_true", help="corpus réduits, sans répétition")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--save", help="fichier JSON où écrire les résultats")
+    parser.add_argument("--baseline", help="fichier JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="baisse d'ops/s tolérée (0.25 = 25 %%)")
+    parser.add_argument("--startup", action="store_true",
+                        help="vérifie seulement le budget de démarrage du tier frugal")
+    parser.add_argument("--hit-rate", action="store_true",
+                        help="mesure seulement la part du trafic gardée par le tier frugal")
+    args = parser.parse_args()
+
+    if args.hit_rate:
+        print(f"{'mode':8s} {'politesse':>10s} {'prompts':>8s} {'p50 µs':>8s} {'p99 µs':>8s}")
+        for mode, row in measure_hit_rate(args.seed).items():
+            timing = row["detect_category"]
+            print(f"{mode:8s} {row['small_talk_hit_rate']:10.1%} "
+                  f"{row['prompt_false_rate']:8.1%} {timing['p50_us']:8.1f} "
+                  f"{timing['p99_us']:8.1f}")
+        return 0
+
+    if args.startup:
+        startup = measure_startup()
+        print(f"import main      : {startup['import_ms']:.1f} ms")
+        print(f"première réponse : {startup['first_reply_ms']:.1f} ms (interpréteur compris)")
+        failures = check_startup(startup)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if not failures:
+            print(f"✅ Tier frugal prêt en moins de {STARTUP_BUDGET_MS} ms")
+        return 1 if failures else 0
+
+    report = run_benchmarks(args.only, args.quick, args.seed)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Résultats enregistrés dans {args.save}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"❌ {name}: {before:.1f} → {after:.1f} ops/s ({change:+.1%})")
+        if regressions:
+            return 1
+        print(f"✅ Aucune régression au-delà de {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
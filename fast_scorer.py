@@ -0,0 +1,168 @@
+"""
+Scoring rapide sans scikit-learn pour les prompts courts
+========================================================
+Pour un prompt d'une ligne, l'essentiel du temps de predict_proba part
+dans la validation des entrées et la construction de matrices sparse.
+Avec un TF-IDF + classifieur linéaire, le score d'une classe est :
+
+    decision[c] = sum_t tf[t] * idf[t] * coef[c, t] / ||tf * idf|| + intercept[c]
+
+On précalcule donc idf[t] * coef[:, t] pour chaque terme du vocabulaire,
+et un prompt se score avec quelques lookups + une somme NumPy. Un artefact
+(model_artifact.py) stocke ces poids : ils sont alors mmappés et partagés
+entre workers au lieu d'être recalculés dans chaque process.
+
+build_fast_scorer retourne None si le modèle ne se décompose pas ainsi :
+l'appelant garde alors le chemin scikit-learn.
+
+Usage :
+    python fast_scorer.py   # benchmark sklearn vs scorer rapide
+"""
+
+import time
+
+import numpy as np
+
+from tokenizer import feature_analyzer
+
+
+def scorer_weights(coef, idf):
+    """
+    Contribution de chaque terme à chaque classe : (n_features, n_classes)
+    """
+    coef = np.asarray(coef, dtype=np.float64)
+    return np.ascontiguousarray((coef * np.asarray(idf, dtype=np.float64)).T)
+
+
+class FastScorer:
+    """
+    Scorer compilé depuis un TfidfVectorizer + LogisticRegression multinomiale
+    weights : poids précalculés (scorer_weights), par exemple mmappés
+    """
+
+    def __init__(self, model, vectorizer, weights=None):
+        self.classes_ = model.classes_
+        # Accepte un str ou un tokenizer.Text (lower déjà calculé)
+        self.analyzer = feature_analyzer(vectorizer)
+        self.vocabulary = vectorizer.vocabulary_
+        self.binary = vectorizer.binary
+        self.sublinear_tf = vectorizer.sublinear_tf
+        self.norm = vectorizer.norm
+
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        if vectorizer.use_idf:
+            idf = np.asarray(vectorizer.idf_, dtype=np.float64)
+        else:
+            idf = np.ones(coef.shape[1])
+        self.idf = idf
+        if weights is None or weights.shape != (coef.shape[1], coef.shape[0]):
+            weights = scorer_weights(coef, idf)
+        self.weights = weights
+        self.intercept = np.asarray(model.intercept_, dtype=np.float64)
+
+    def decision_function(self, text):
+        counts = {}
+        vocabulary = self.vocabulary
+        for token in self.analyzer(text):
+            index = vocabulary.get(token)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+
+        if not counts:
+            return self.intercept.copy()
+
+        indices = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self.binary:
+            tf[:] = 1.0
+        elif self.sublinear_tf:
+            tf = np.log(tf) + 1.0
+
+        decision = tf @ self.weights[indices]
+        if self.norm == "l2":
+            decision /= np.sqrt(np.sum((tf * self.idf[indices]) ** 2))
+        elif self.norm == "l1":
+            decision /= np.sum(np.abs(tf * self.idf[indices]))
+        return decision + self.intercept
+
+    def predict_proba(self, text):
+        """
+        Probabilités (softmax) pour un seul texte, comme model.predict_proba
+        """
+        decision = self.decision_function(text)
+        decision -= decision.max()
+        exp = np.exp(decision)
+        return exp / exp.sum()
+
+    def predict(self, text):
+        return self.classes_[int(np.argmax(self.decision_function(text)))]
+
+
+def build_fast_scorer(model, vectorizer, weights=None):
+    """
+    FastScorer si le couple modèle/vectorizer est décomposable, sinon None
+    weights : poids précalculés de l'artefact chargé (load_scorer_weights)
+    """
+    if type(model).__name__ != "LogisticRegression":
+        return None
+    if type(vectorizer).__name__ != "TfidfVectorizer":
+        return None
+    if not hasattr(model, "coef_") or not hasattr(vectorizer, "vocabulary_"):
+        return None
+    # Binaire : predict_proba n'est pas un softmax sur coef_
+    if len(model.classes_) <= 2 or model.coef_.shape[0] != len(model.classes_):
+        return None
+    # One-vs-rest (anciennes versions) : probas normalisées, pas un softmax
+    if getattr(model, "multi_class", "auto") == "ovr":
+        return None
+    if vectorizer.norm not in ("l2", "l1", None):
+        return None
+    return FastScorer(model, vectorizer, weights)
+
+
+def benchmark_fast_scorer(model, vectorizer, prompts, repeat=200):
+    """
+    Compare sklearn (transform + predict_proba) et le scorer rapide
+    Retourne les latences moyennes (µs/prompt), le speedup et l'écart max
+    """
+    scorer = build_fast_scorer(model, vectorizer)
+    if scorer is None:
+        raise ValueError("Modèle non décomposable : pas de scorer rapide")
+
+    max_diff = 0.0
+    for prompt in prompts:
+        reference = model.predict_proba(vectorizer.transform([prompt]))[0]
+        max_diff = max(max_diff, float(np.max(np.abs(reference - scorer.predict_proba(prompt)))))
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for prompt in prompts:
+            model.predict_proba(vectorizer.transform([prompt]))
+    sklearn_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for prompt in prompts:
+            scorer.predict_proba(prompt)
+    fast_time = time.perf_counter() - start
+
+    calls = repeat * len(prompts)
+    return {
+        "prompts": len(prompts),
+        "sklearn_us": sklearn_time / calls * 1e6,
+        "fast_us": fast_time / calls * 1e6,
+        "speedup": sklearn_time / fast_time,
+        "max_proba_diff": max_diff,
+    }
+
+
+if __name__ == "__main__":
+    from model_artifact import VERIFY_PROMPTS, load_model_files
+
+    model, vectorizer, source = load_model_files()
+    report = benchmark_fast_scorer(model, vectorizer, VERIFY_PROMPTS)
+    print(f"Modèle chargé depuis : {source}")
+    print(f"  sklearn        : {report['sklearn_us']:8.1f} µs/prompt")
+    print(f"  scorer rapide  : {report['fast_us']:8.1f} µs/prompt")
+    print(f"  speedup        : x{report['speedup']:.1f}")
+    print(f"  écart max proba: {report['max_proba_diff']:.2e}")
@@ -0,0 +1,252 @@
+"""
+Phrases approchées, mot à mot
+=============================
+phrase_index ne reconnaît une phrase ("how are you", "see you"...) que
+écrite telle quelle, et le tier frugal abandonne les typos au-delà de deux
+mots : "how ar yuo doing" ou "thnks a lot my friend" partaient au modèle.
+
+Ici un message court est aligné sur les phrases des keywords mot à mot :
+- deux mots se correspondent s'ils sont identiques, similaires pour
+  is_similar, ou (mots courts, où is_similar n'admet aucune faute) à une
+  opération près, première lettre identique : insertion, suppression ou
+  inversion de deux lettres voisines ; substitution seulement à partir de
+  4 lettres ("sue" ne donne pas "see")
+- un mot de la phrase n'est jamais remplacé par un autre mot : seuls des
+  mots de remplissage peuvent manquer ou être en trop, (n - 1) // 2 au plus
+  pour une phrase de n mots ("thanks lot" -> "thanks a lot", mais "who are
+  you" ou "how are prices" ne donnent pas "how are you")
+
+Le message n'est reconnu que s'il est entièrement couvert : chaque mot hors
+de la phrase alignée est un mot de remplissage (FILLER_WORDS) ou un keyword
+d'un mot (index des typos). "how are the results" reste donc au modèle.
+Sans phrase, un keyword d'un mot entouré de remplissage ne suffit pas pour
+les catégories de FALLBACK_EXCLUDED : "please close this" ne doit pas
+fermer la session.
+
+Index précalculé : les mots des phrases sont enregistrés sous leurs
+suppressions (comme build_typo_index), et chaque mot pointe vers ses
+phrases : seules les phrases qui partagent un mot avec le message sont
+alignées.
+"""
+
+import re
+
+from is_similar import (deletion_neighbourhood, levenshtein_distance_bounded,
+                        lookup_typo_category, max_typo_distance,
+                        _is_similar_normalized)
+from tokenizer import normalize_message
+
+# Au-delà, le message part au modèle sans alignement
+FUZZY_MAX_WORDS = 8
+
+# Mots qui accompagnent une formule de politesse sans en changer le sens
+# ("you", "it", "this", "that" portent le sens des phrases : pas ici)
+FILLER_WORDS = frozenset("""
+    a an the and so very much lot lots for all again too
+    really doing today tonight there then now my dear friend friends
+    everyone everybody guys man mate buddy bro oh well please
+""".split())
+
+# Catégories jamais déduites d'un keyword d'un mot + remplissage : leurs
+# keywords sont aussi des verbes ("close", "exit", "quit") et la réponse
+# termine la session
+FALLBACK_EXCLUDED = frozenset({"reply_goodbye"})
+
+# Mots retenus par index (une entrée par mot distinct du message)
+FUZZY_CACHE_SIZE = 10000
+
+_WORD_RE = re.compile(r"[\w']+")
+
+
+def split_words(message):
+    """
+    Mots d'un message déjà normalisé, sans la ponctuation
+    """
+    return _WORD_RE.findall(message)
+
+
+def _is_transposition(word, token):
+    # Deux lettres voisines inversées ("yuo" / "you")
+    if len(word) != len(token):
+        return False
+    diff = [i for i in range(len(word)) if word[i] != token[i]]
+    return (len(diff) == 2 and diff[1] == diff[0] + 1
+            and word[diff[0]] == token[diff[1]] and word[diff[1]] == token[diff[0]])
+
+
+def tokens_similar(word, token, threshold=0.80):
+    """
+    Deux mots normalisés se correspondent-ils ?
+    """
+    if word == token:
+        return True
+    if len(word) < 2 or len(token) < 2 or word[0] != token[0]:
+        return False
+    if _is_similar_normalized(word, token, threshold):
+        return True
+    if _is_transposition(word, token):
+        return True
+    # Mots courts : une substitution change trop souvent le mot ("she", "sue")
+    if len(word) == len(token) and len(word) < 4:
+        return False
+    return levenshtein_distance_bounded(word, token, 1) <= 1
+
+
+def build_fuzzy_index(keywords, threshold=0.80):
+    """
+    Précalcule les phrases (keywords à plusieurs mots) d'une table
+    {category: [keyword, ...]}
+    Retourne {"phrases", "by_token", "deletes", "threshold", "cache"} :
+    - phrases   : [(rang, catégorie, mots, distance max)]
+    - by_token  : mot de phrase -> numéros des phrases qui le contiennent
+    - deletes   : suppression -> mots de phrase (candidats similaires)
+    """
+    phrases = []
+    seen = set()
+    for rank, (category, keyword_list) in enumerate(keywords.items()):
+        for keyword in keyword_list:
+            if " " not in keyword:
+                continue
+            # "see u" et "see you" donnent la même phrase
+            tokens = tuple(split_words(normalize_message(keyword).strip()))
+            if len(tokens) < 2 or (category, tokens) in seen:
+                continue
+            seen.add((category, tokens))
+            phrases.append((rank, category, tokens, (len(tokens) - 1) // 2))
+
+    by_token = {}
+    for number, (_, _, tokens, _) in enumerate(phrases):
+        for token in set(tokens):
+            by_token.setdefault(token, []).append(number)
+
+    deletes = {}
+    for token in by_token:
+        # Au moins une suppression : les fautes des mots courts
+        max_deletes = max(1, max_typo_distance(len(token) + 2, threshold))
+        for deleted in deletion_neighbourhood(token, max_deletes):
+            deletes.setdefault(deleted, set()).add(token)
+
+    return {
+        "phrases": phrases,
+        "by_token": by_token,
+        "deletes": deletes,
+        "max_length": max((len(token) for token in by_token), default=0),
+        "threshold": threshold,
+        "cache": {},
+    }
+
+
+def similar_tokens(index, word):
+    """
+    Mots de phrase qui correspondent à word (frozenset, mis en cache)
+    """
+    cache = index["cache"]
+    found = cache.get(word)
+    if found is not None:
+        return found
+
+    # Plus de 2 lettres de plus que tout mot de phrase : aucun candidat
+    if len(word) > index["max_length"] + 2:
+        return frozenset()
+
+    threshold = index["threshold"]
+    deletes = index["deletes"]
+    max_deletes = max(1, max_typo_distance(len(word) + 2, threshold))
+    candidates = set()
+    for deleted in deletion_neighbourhood(word, max_deletes):
+        candidates |= deletes.get(deleted, set())
+    found = frozenset(token for token in candidates
+                      if tokens_similar(word, token, threshold))
+
+    if len(cache) >= FUZZY_CACHE_SIZE:
+        cache.clear()
+    cache[word] = found
+    return found
+
+
+def _token_distance(window, matches, tokens, limit):
+    """
+    Nombre de mots de remplissage en trop (dans window) ou manquants (dans
+    tokens) pour aligner window sur tokens, sans substitution (limit + 1
+    au-delà ou si l'alignement est impossible)
+    matches[i] : mots de phrase similaires à window[i]
+    """
+    impossible = limit + 1
+    previous = [0] * (len(tokens) + 1)
+    for j in range(1, len(tokens) + 1):
+        missing = tokens[j - 1] in FILLER_WORDS
+        previous[j] = previous[j - 1] + 1 if missing else impossible
+    for i in range(1, len(window) + 1):
+        extra = window[i - 1] in FILLER_WORDS
+        current = [previous[0] + 1 if extra else impossible] + [0] * len(tokens)
+        for j in range(1, len(tokens) + 1):
+            best = previous[j - 1] if tokens[j - 1] in matches[i - 1] else impossible
+            if extra:
+                best = min(best, previous[j] + 1)
+            if tokens[j - 1] in FILLER_WORDS:
+                best = min(best, current[j - 1] + 1)
+            current[j] = min(best, impossible)
+        if min(current) > limit:
+            return impossible
+        previous = current
+    return previous[-1]
+
+
+def find_fuzzy_category(index, words, typo_index=None):
+    """
+    Catégorie d'un message court entièrement couvert par une phrase
+    approchée (+ mots de remplissage / keywords d'un mot), ou None
+    words : mots normalisés du message (split_words)
+    typo_index : index des keywords d'un mot (is_similar.build_typo_index)
+    """
+    count = len(words)
+    if not count or count > FUZZY_MAX_WORDS:
+        return None
+
+    matches = [similar_tokens(index, word) for word in words]
+
+    # Mots couverts hors phrase : remplissage ou keyword d'un mot
+    single = []
+    for word in words:
+        match = None
+        if typo_index is not None and word not in FILLER_WORDS:
+            match = lookup_typo_category(typo_index, word)
+        single.append(match)
+    free = [word in FILLER_WORDS or match is not None
+            for word, match in zip(words, single)]
+
+    candidates = set()
+    for found in matches:
+        for token in found:
+            candidates.update(index["by_token"][token])
+
+    best = None
+    phrases = index["phrases"]
+    for number in candidates:
+        rank, category, tokens, limit = phrases[number]
+        if best is not None and rank >= best[0]:
+            continue
+        length = len(tokens)
+        for start in range(count):
+            for end in range(start + max(1, length - limit),
+                             min(count, start + length + limit) + 1):
+                if not (all(free[:start]) and all(free[end:])):
+                    continue
+                if _token_distance(words[start:end], matches[start:end],
+                                   tokens, limit) <= limit:
+                    best = (rank, category)
+                    break
+            if best is not None and best[0] == rank:
+                break
+
+    if best is not None:
+        return best[1]
+
+    # Pas de phrase : au moins un keyword d'un mot, le reste en remplissage
+    # (sauf catégories ambiguës, qui exigent une phrase)
+    if all(free):
+        hits = [match for match in single
+                if match is not None and match[1] not in FALLBACK_EXCLUDED]
+        if hits:
+            return min(hits)[1]
+    return None
@@ -0,0 +1,132 @@
+"""
+Instrumentation légère des étapes du pipeline
+=============================================
+Compteurs + histogrammes de latence par étape (buckets log-linéaires
+façon HDR : 16 sous-buckets par puissance de 2, ~6 % d'erreur relative,
+mémoire bornée quel que soit le nombre de mesures).
+
+Désactivé par défaut. Dans le code instrumenté :
+
+    timed = instrumentation.ENABLED
+    if timed:
+        t = instrumentation.now()
+    ...étape...
+    if timed:
+        t = instrumentation.lap("etape", t)
+
+Désactivé, le coût se limite à la lecture d'un booléen.
+"""
+
+import threading
+import time
+
+ENABLED = False
+
+SUB_BUCKETS = 16
+
+now = time.perf_counter_ns
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _bucket_index(value):
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - 5
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def _bucket_value(index):
+    """
+    Milieu du bucket (en ns)
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    low = (index - shift * SUB_BUCKETS) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+def record(stage, elapsed_ns):
+    """
+    Ajoute une mesure (ns) à l'histogramme de stage
+    """
+    index = _bucket_index(max(0, int(elapsed_ns)))
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = {"count": 0, "total": 0, "buckets": {}}
+        histogram["count"] += 1
+        histogram["total"] += elapsed_ns
+        buckets = histogram["buckets"]
+        buckets[index] = buckets.get(index, 0) + 1
+
+
+def lap(stage, start_ns):
+    """
+    Enregistre le temps écoulé depuis start_ns et retourne le nouvel instant
+    """
+    end = now()
+    record(stage, end - start_ns)
+    return end
+
+
+def count(name, increment=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + increment
+
+
+def _percentiles(buckets, total_count, quantiles):
+    results = {}
+    remaining = sorted(quantiles)
+    seen = 0
+    for index in sorted(buckets):
+        seen += buckets[index]
+        while remaining and seen >= remaining[0] * total_count:
+            results[remaining.pop(0)] = _bucket_value(index)
+        if not remaining:
+            break
+    return results
+
+
+def snapshot(quantiles=(0.50, 0.95, 0.99)):
+    """
+    État courant : compteurs + count / moyenne / percentiles (ms) par étape
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {stage: (h["count"], h["total"], dict(h["buckets"]))
+                      for stage, h in _histograms.items()}
+
+    stages = {}
+    for stage, (total_count, total_ns, buckets) in histograms.items():
+        values = _percentiles(buckets, total_count, quantiles)
+        stages[stage] = {
+            "count": total_count,
+            "mean_ms": total_ns / total_count / 1e6,
+            **{f"p{int(q * 100)}_ms": values[q] / 1e6 for q in quantiles},
+        }
+    return {"counters": counters, "stages": stages}
+
+
+def tier_ratios(counters, prefix="tier."):
+    """
+    Part de chaque tier (compteurs tier.*) dans le total
+    """
+    tiers = {name[len(prefix):]: value for name, value in counters.items()
+             if name.startswith(prefix)}
+    total = sum(tiers.values())
+    return {tier: value / total for tier, value in tiers.items()} if total else {}
@@ -10,6 +10,9 @@ Combines multiple algorithms for the most reliable typo detection:
 - Smart weighting system
 """
 
+from functools import lru_cache
+from itertools import product
+
 # ============================================================================
 # KEYBOARD LAYOUT DEFINITIONS
 # ============================================================================
@@ -48,6 +51,33 @@ PHONETIC_GROUPS = [
     {'c', 'q', 'k'},           # hard 'c'
 ]
 
+# ============================================================================
+# DENSE LOOKUP TABLES (char code x char code)
+# ============================================================================
+# Compiled once at import: table[ord(c1) * CHAR_TABLE_SIZE + ord(c2)] == 1
+# when the pair is similar. Characters outside ASCII only match themselves.
+
+CHAR_TABLE_SIZE = 128
+
+def _char_table(similar):
+    table = bytearray(CHAR_TABLE_SIZE * CHAR_TABLE_SIZE)
+    for code in range(CHAR_TABLE_SIZE):
+        table[code * CHAR_TABLE_SIZE + code] = 1
+    for char1, char2 in similar:
+        if len(char1) == 1 and len(char2) == 1:
+            code1, code2 = ord(char1), ord(char2)
+            if code1 < CHAR_TABLE_SIZE and code2 < CHAR_TABLE_SIZE:
+                table[code1 * CHAR_TABLE_SIZE + code2] = 1
+                table[code2 * CHAR_TABLE_SIZE + code1] = 1
+    return bytes(table)
+
+QWERTY_TABLE = _char_table((key, neighbor) for key, neighbors in QWERTY_NEIGHBORS.items()
+                           for neighbor in neighbors)
+AZERTY_TABLE = _char_table((key, neighbor) for key, neighbors in AZERTY_NEIGHBORS.items()
+                           for neighbor in neighbors)
+PHONETIC_TABLE = _char_table(pair for group in PHONETIC_GROUPS
+                             for pair in product(group, repeat=2))
+
 # Common letter substitutions
 COMMON_SUBSTITUTIONS = {
     'u': 'you',
@@ -127,6 +157,150 @@ def damerau_levenshtein_distance(s1, s2):
     return H[len1, len2]
 
 
+# ============================================================================
+# BOUNDED DISTANCES (early exit, two reusable rows)
+# ============================================================================
+# Same results as the functions above, but only what is_similar and
+# calculate_typo_score need: the exact distance when it is <= max_distance,
+# otherwise max_distance + 1.
+
+def levenshtein_distance_bounded(s1, s2, max_distance=None):
+    """
+    Levenshtein distance restricted to the diagonal band |i - j| <= max_distance
+    Returns max_distance + 1 as soon as the distance is known to exceed it
+    """
+    len1, len2 = len(s1), len(s2)
+    if max_distance is None:
+        max_distance = max(len1, len2)
+    over = max_distance + 1
+    
+    # Length difference alone is already too many edits
+    if abs(len1 - len2) > max_distance:
+        return over
+    if len1 == 0 or len2 == 0:
+        return len1 + len2
+    
+    previous = [j if j <= max_distance else over for j in range(len2 + 1)]
+    current = [over] * (len2 + 1)
+    
+    for i in range(1, len1 + 1):
+        lo = max(1, i - max_distance)
+        hi = min(len2, i + max_distance)
+        current[lo - 1] = min(i, over) if lo == 1 else over
+        row_min = current[lo - 1]
+        c1 = s1[i - 1]
+        
+        for j in range(lo, hi + 1):
+            cost = 0 if c1 == s2[j - 1] else 1
+            value = min(
+                previous[j] + 1,         # Deletion
+                current[j - 1] + 1,      # Insertion
+                previous[j - 1] + cost,  # Substitution
+                over
+            )
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        
+        # Cell just right of the band is read by the next row
+        if hi < len2:
+            current[hi + 1] = over
+        
+        # Every path goes through this row: nothing can get cheaper
+        if row_min > max_distance:
+            return over
+        
+        previous, current = current, previous
+    
+    return previous[len2]
+
+
+def damerau_levenshtein_distance_bounded(s1, s2, max_distance=None):
+    """
+    Same recurrence as damerau_levenshtein_distance, on two reusable rows
+    Returns max_distance + 1 as soon as the distance is known to exceed it
+    
+    The transposition term of the reference version reads H[k-1, l-1] with
+    l being the substitution cost, which boils down to i + j - 3 after a
+    mismatch when the row already had a match (k >= 1). It is reproduced
+    as-is so scores do not move. Where the reference raises KeyError
+    (k - 1 > len(s1)) the term is simply ignored.
+    """
+    len1, len2 = len(s1), len(s2)
+    if max_distance is None:
+        max_distance = max(len1, len2)
+    over = max_distance + 1
+    
+    previous = list(range(len2 + 1))
+    current = [0] * (len2 + 1)
+    
+    for i in range(1, len1 + 1):
+        current[0] = i
+        row_min = i
+        c1 = s1[i - 1]
+        DB = 0
+        
+        for j in range(1, len2 + 1):
+            k = DB
+            if c1 == s2[j - 1]:
+                cost = 0
+                DB = j
+            else:
+                cost = 1
+            
+            value = min(
+                previous[j] + 1,         # Deletion
+                current[j - 1] + 1,      # Insertion
+                previous[j - 1] + cost   # Substitution
+            )
+            # Transposition (see docstring)
+            if cost and k >= 1 and k - 1 <= len1 and i + j - 3 < value:
+                value = i + j - 3
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        
+        # Later rows never go below min(row_min, i) (row_min <= i here)
+        if row_min > max_distance:
+            return over
+        
+        previous, current = current, previous
+    
+    return min(previous[len2], over)
+
+
+def check_bounded_distances(alphabet='abc', max_length=4):
+    """
+    Compare the bounded distances with the reference ones on every pair of
+    words over alphabet up to max_length, for every cutoff
+    Returns the list of mismatches (empty when everything agrees)
+    """
+    words = [''.join(chars)
+             for length in range(max_length + 1)
+             for chars in product(alphabet, repeat=length)]
+    
+    mismatches = []
+    for w1 in words:
+        for w2 in words:
+            expected_lev = levenshtein_distance(w1, w2)
+            try:
+                expected_dam = damerau_levenshtein_distance(w1, w2)
+            except KeyError:
+                expected_dam = None
+            
+            for cutoff in range(max(len(w1), len(w2)) + 1):
+                got = levenshtein_distance_bounded(w1, w2, cutoff)
+                if got != min(expected_lev, cutoff + 1):
+                    mismatches.append(('levenshtein', w1, w2, cutoff, got))
+                if expected_dam is None:
+                    continue
+                got = damerau_levenshtein_distance_bounded(w1, w2, cutoff)
+                if got != min(expected_dam, cutoff + 1):
+                    mismatches.append(('damerau', w1, w2, cutoff, got))
+    
+    return mismatches
+
+
 def are_keys_adjacent(char1, char2, layout='qwerty'):
     """
     Check if two characters are adjacent on keyboard
@@ -135,6 +309,13 @@ def are_keys_adjacent(char1, char2, layout='qwerty'):
     if char1 == char2:
         return True
     
+    if len(char1) == 1 and len(char2) == 1:
+        code1, code2 = ord(char1), ord(char2)
+        if code1 >= CHAR_TABLE_SIZE or code2 >= CHAR_TABLE_SIZE:
+            return False
+        table = QWERTY_TABLE if layout == 'qwerty' else AZERTY_TABLE
+        return table[code1 * CHAR_TABLE_SIZE + code2] == 1
+    
     neighbors = QWERTY_NEIGHBORS if layout == 'qwerty' else AZERTY_NEIGHBORS
     
     # Check both directions
@@ -149,6 +330,12 @@ def are_phonetically_similar(char1, char2):
     if char1 == char2:
         return True
     
+    if len(char1) == 1 and len(char2) == 1:
+        code1, code2 = ord(char1), ord(char2)
+        if code1 >= CHAR_TABLE_SIZE or code2 >= CHAR_TABLE_SIZE:
+            return False
+        return PHONETIC_TABLE[code1 * CHAR_TABLE_SIZE + code2] == 1
+    
     for group in PHONETIC_GROUPS:
         if char1 in group and char2 in group:
             return True
@@ -241,8 +428,8 @@ def calculate_typo_score(user_word, keyword):
     # FACTOR 3: Damerau-Levenshtein (30 points)
     # ========================================
     max_score += 30
-    distance = damerau_levenshtein_distance(user_word, keyword)
     max_len = max(len(user_word), len(keyword))
+    distance = damerau_levenshtein_distance_bounded(user_word, keyword, max_len)
     
     if max_len > 0:
         similarity_ratio = 1 - (distance / max_len)
@@ -293,6 +480,181 @@ def calculate_typo_score(user_word, keyword):
     return final_score
 
 
+# ============================================================================
+# VECTORIZED SCORING (NumPy)
+# ============================================================================
+
+def _encode_words(words, pad):
+    """
+    Words -> (char code matrix padded with pad, lengths)
+    Codes outside the lookup tables are mapped to CHAR_TABLE_SIZE
+    """
+    import numpy as np
+    
+    lengths = np.array([len(word) for word in words], dtype=np.intp)
+    width = int(lengths.max()) if len(words) else 0
+    codes = np.full((len(words), width), pad, dtype=np.int64)
+    for row, word in enumerate(words):
+        codes[row, :len(word)] = [ord(char) for char in word]
+    return codes, lengths
+
+
+@lru_cache(maxsize=None)
+def _dense_table(table):
+    import numpy as np
+    
+    dense = np.frombuffer(table, dtype=np.uint8).reshape(CHAR_TABLE_SIZE, CHAR_TABLE_SIZE)
+    # Extra row / column of zeros for codes outside the table (and padding)
+    return np.pad(dense, (0, 1)) == 1
+
+
+def _table_lookup(table, codes1, codes2):
+    """
+    Dense table lookup on code arrays; equal codes are always similar
+    """
+    import numpy as np
+    
+    dense = _dense_table(table)
+    index1 = np.where((codes1 >= 0) & (codes1 < CHAR_TABLE_SIZE), codes1, CHAR_TABLE_SIZE)
+    index2 = np.where((codes2 >= 0) & (codes2 < CHAR_TABLE_SIZE), codes2, CHAR_TABLE_SIZE)
+    return dense[index1, index2] | (codes1 == codes2)
+
+
+def _damerau_many(user_codes, user_lengths, keyword_codes, keyword_lengths):
+    """
+    damerau_levenshtein_distance_bounded for every (word, keyword) pair
+    One DP over (n_words, n_keywords) arrays, same recurrence and quirk
+    """
+    import numpy as np
+    
+    n, m = len(user_lengths), len(keyword_lengths)
+    width1, width2 = user_codes.shape[1], keyword_codes.shape[1]
+    
+    previous = np.broadcast_to(np.arange(width2 + 1), (n, m, width2 + 1)).copy()
+    current = np.empty_like(previous)
+    # Row len(user_word) of each pair = its distance row
+    final = previous.copy()
+    len1 = user_lengths[:, None]
+    
+    for i in range(1, width1 + 1):
+        current[:, :, 0] = i
+        c1 = user_codes[:, i - 1][:, None]
+        DB = np.zeros((n, m), dtype=np.intp)
+        
+        for j in range(1, width2 + 1):
+            k = DB
+            match = c1 == keyword_codes[:, j - 1][None, :]
+            DB = np.where(match, j, DB)
+            cost = (~match).astype(previous.dtype)
+            
+            value = np.minimum(np.minimum(previous[:, :, j] + 1, current[:, :, j - 1] + 1),
+                               previous[:, :, j - 1] + cost)
+            # Transposition term of the reference version (i + j - 3)
+            transposed = (cost == 1) & (k >= 1) & (k - 1 <= len1) & (i + j - 3 < value)
+            current[:, :, j] = np.where(transposed, i + j - 3, value)
+        
+        done = user_lengths == i
+        final[done] = current[done]
+        previous, current = current, previous
+    
+    return np.take_along_axis(final, np.broadcast_to(keyword_lengths[None, :, None], (n, m, 1)),
+                              axis=2)[:, :, 0]
+
+
+def score_many(words, keywords):
+    """
+    calculate_typo_score for every (word, keyword) pair, in NumPy
+    Returns a (len(words), len(keywords)) float64 matrix with exactly the
+    scores of the scalar function (same operations, same order)
+    """
+    import numpy as np
+    
+    words = [word.lower() for word in words]
+    keywords = [keyword.lower() for keyword in keywords]
+    scores = np.zeros((len(words), len(keywords)))
+    if not words or not keywords:
+        return scores
+    
+    user_codes, user_lengths = _encode_words(words, -1)
+    keyword_codes, keyword_lengths = _encode_words(keywords, -2)
+    len1, len2 = user_lengths[:, None], keyword_lengths[None, :]
+    
+    # String identities for the exact-match and repeated-letters factors
+    ids = {}
+    def ids_of(strings):
+        return np.array([ids.setdefault(s, len(ids)) for s in strings], dtype=np.intp)
+    word_ids, keyword_ids = ids_of(words), ids_of(keywords)
+    word_norm_ids = ids_of(remove_repeated_letters(word) for word in words)
+    keyword_norm_ids = ids_of(remove_repeated_letters(keyword) for keyword in keywords)
+    
+    # FACTOR 1: First letter match
+    first1 = user_codes[:, :1] if user_codes.shape[1] else np.full((len(words), 1), -1)
+    first2 = (keyword_codes[:, :1] if keyword_codes.shape[1]
+              else np.full((len(keywords), 1), -2)).T
+    score = np.where(first1 == first2, 15.0,
+                     np.where(_table_lookup(QWERTY_TABLE, first1, first2), 7.0, 0.0))
+    
+    # FACTOR 2: Length similarity
+    len_diff = np.abs(len1 - len2)
+    score = score + np.select([len_diff == 0, len_diff == 1, len_diff == 2], [10, 6, 2], 0)
+    
+    # FACTOR 3: Damerau-Levenshtein
+    max_len = np.maximum(len1, len2)
+    distance = _damerau_many(user_codes, user_lengths, keyword_codes, keyword_lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        similarity_ratio = 1 - (distance / max_len)
+    score = score + similarity_ratio * 30
+    
+    # FACTOR 4 + 5: Keyboard proximity + phonetic similarity (same length only)
+    adjacent_count = np.zeros(scores.shape)
+    phonetic_matches = np.zeros(scores.shape, dtype=np.intp)
+    for p in range(min(user_codes.shape[1], keyword_codes.shape[1])):
+        a, b = user_codes[:, p][:, None], keyword_codes[:, p][None, :]
+        valid = (p < len1) & (p < len2)
+        equal = a == b
+        adjacent = _table_lookup(QWERTY_TABLE, a, b)
+        adjacent_count += np.where(valid & equal, 1.0, np.where(valid & adjacent, 0.5, 0.0))
+        phonetic_matches += valid & _table_lookup(PHONETIC_TABLE, a, b)
+    same_length = len1 == len2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.where(same_length, score + (adjacent_count / len2) * 20, score)
+        score = np.where(same_length, score + (phonetic_matches / len2) * 15, score)
+    
+    # FACTOR 6: Repeated letters pattern
+    word_norm, keyword_norm = word_norm_ids[:, None], keyword_norm_ids[None, :]
+    score = score + np.where(word_norm == keyword_norm, 10,
+                             np.where((word_norm == keyword_ids[None, :])
+                                      | (word_ids[:, None] == keyword_norm), 8, 0))
+    
+    scores = score / 100.0
+    
+    # Exact match / empty words
+    scores[(len1 == 0) | (len2 == 0)] = 0.0
+    scores[word_ids[:, None] == keyword_ids[None, :]] = 1.0
+    return scores
+
+
+def check_score_many(alphabet='acks', max_length=3):
+    """
+    Compare score_many with calculate_typo_score on every pair of words
+    over alphabet up to max_length
+    Returns the list of mismatches (empty when everything agrees)
+    """
+    words = [''.join(chars)
+             for length in range(max_length + 1)
+             for chars in product(alphabet, repeat=length)]
+    
+    scores = score_many(words, words)
+    mismatches = []
+    for i, w1 in enumerate(words):
+        for j, w2 in enumerate(words):
+            expected = calculate_typo_score(w1, w2)
+            if scores[i, j] != expected:
+                mismatches.append(('score_many', w1, w2, scores[i, j], expected))
+    
+    return mismatches
+
+
 # ============================================================================
 # MAIN TYPO DETECTION FUNCTION
 # ============================================================================
@@ -301,9 +663,12 @@ def is_similar(user_word, keyword, threshold=0.80):
     """
     Version simplifiée et efficace
     """
-    user_word = user_word.lower().strip()
-    keyword = keyword.lower().strip()
-    
+    return _is_similar_normalized(user_word.lower().strip(), keyword.lower().strip(), threshold)
+
+def _is_similar_normalized(user_word, keyword, threshold):
+    """
+    is_similar sur des mots déjà en minuscules et sans espaces autour
+    """
     # Exact match
     if user_word == keyword:
         return True
@@ -321,11 +686,128 @@ def is_similar(user_word, keyword, threshold=0.80):
     if len_diff > 2:
         return False
     
-    # Distance Levenshtein simple
-    distance = levenshtein_distance(user_word, keyword)
+    # Distance Levenshtein bornée : on s'arrête dès que le seuil est raté
     max_len = max(len(user_word), len(keyword))
+    max_distance = max_typo_distance(max_len, threshold)
+    distance = levenshtein_distance_bounded(user_word, keyword, max_distance)
     
     # Score simple : 1 - (distance / longueur)
     score = 1 - (distance / max_len)
     
-    return score >= threshold
\ No newline at end of file
+    return score >= threshold
+
+# ============================================================================
+# TYPO INDEX (SymSpell-style deletion neighbourhood)
+# ============================================================================
+
+# Max number of user words remembered by an index before its cache is reset
+TYPO_CACHE_SIZE = 10000
+
+@lru_cache(maxsize=1024)
+def max_typo_distance(max_len, threshold=0.80):
+    """
+    Largest edit distance that still passes is_similar's score rule
+    (1 - distance / max_len >= threshold) for a given max_len
+    """
+    distance = 0
+    while distance < max_len and 1 - ((distance + 1) / max_len) >= threshold:
+        distance += 1
+    return distance
+
+
+def deletion_neighbourhood(word, max_deletes):
+    """
+    All strings obtained by deleting up to max_deletes characters from word
+    Example: ("hey", 1) -> {"hey", "ey", "hy", "he"}
+    """
+    found = {word}
+    frontier = {word}
+    for _ in range(max_deletes):
+        next_frontier = set()
+        for candidate in frontier:
+            for i in range(len(candidate)):
+                deleted = candidate[:i] + candidate[i + 1:]
+                if deleted not in found:
+                    next_frontier.add(deleted)
+        found |= next_frontier
+        frontier = next_frontier
+    return found
+
+
+def build_typo_index(keywords, threshold=0.80):
+    """
+    Precompute a deletion map over the single-word keywords of a
+    {category: [keyword, ...]} table
+
+    Every keyword is registered under each of its deletions, so a user word
+    only has to generate its own deletions to find all keywords within
+    reach. Candidates are then confirmed with is_similar, which keeps the
+    answer identical to scanning the whole table.
+    """
+    deletes = {}
+    for rank, (category, keyword_list) in enumerate(keywords.items()):
+        for keyword in keyword_list:
+            # Seulement keywords simples (pas de phrases)
+            if " " in keyword:
+                continue
+            normalized = keyword.lower().strip()
+            if not normalized:
+                continue
+            # A user word is at most 2 chars longer than the keyword
+            max_deletes = max_typo_distance(len(normalized) + 2, threshold)
+            for deleted in deletion_neighbourhood(normalized, max_deletes):
+                deletes.setdefault(deleted, []).append((rank, category, normalized))
+
+    return {
+        "threshold": threshold,
+        "deletes": deletes,
+        "max_length": max((len(k) for k in deletes), default=0),
+        "cache": {},
+    }
+
+
+def lookup_typo_category(index, user_word):
+    """
+    Return (rank, category) of the first category with a keyword similar
+    to user_word, or None. Rank follows the order of the keyword table.
+    """
+    cache = index["cache"]
+    if user_word in cache:
+        return cache[user_word]
+
+    threshold = index["threshold"]
+    deletes = index["deletes"]
+    word = user_word.lower().strip()
+
+    best = None
+    # A user word is at most 2 chars longer than a keyword; longer words
+    # would only blow up the deletion neighbourhood
+    if word and len(word) <= index["max_length"] + 2:
+        # A keyword is at most 2 chars longer than the user word
+        max_deletes = max_typo_distance(len(word) + 2, threshold)
+        seen = set()
+        for deleted in deletion_neighbourhood(word, max_deletes):
+            for rank, category, keyword in deletes.get(deleted, ()):
+                if best is not None and rank >= best[0]:
+                    continue
+                if (rank, keyword) in seen:
+                    continue
+                seen.add((rank, keyword))
+                # Les deux côtés sont déjà normalisés
+                if _is_similar_normalized(word, keyword, threshold):
+                    best = (rank, category)
+
+    if len(cache) >= TYPO_CACHE_SIZE:
+        cache.clear()
+    cache[user_word] = best
+    return best
+
+
+if __name__ == "__main__":
+    # Vérifie que les distances bornées = distances de référence,
+    # et que score_many = calculate_typo_score
+    mismatches = check_bounded_distances() + check_score_many()
+    for mismatch in mismatches[:20]:
+        print("MISMATCH", mismatch)
+    print(f"{len(mismatches)} mismatch(es)")
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,275 @@
+"""
+Générateur de charge : rejoue un journal de requêtes JSONL
+==========================================================
+Les microbenchmarks (benchmarks.py) mesurent une fonction à la fois. Ici
+on rejoue un trafic mixte complet à travers le pipeline de routage
+(router.py, comme main.py) ou contre un serveur HTTP (server.py) :
+salutations courtes (respond), salutations avec typos (is_similar) et
+une traîne de prompts longs (model_interface).
+
+Journal : une ligne par requête, au format de router.parse_record
+    {"id": 1, "message": "hello"}   ou   "hello"
+
+Avec --rate, la requête i est due à t0 + i / rate : sa latence est
+comptée depuis cette date (attente d'un worker libre comprise), pour ne
+pas masquer la file d'attente quand le pipeline sature. Sans --rate,
+les N workers enchaînent les requêtes aussi vite que possible.
+
+Les caches (résultats IA, quasi-doublons si activés) restent actifs, comme en
+production : un journal qui se répète mesure aussi leur effet.
+
+Usage :
+    python loadgen.py traffic.jsonl --generate 5000       # écrit un journal mixte
+    python loadgen.py traffic.jsonl --workers 8           # débit max
+    python loadgen.py traffic.jsonl --rate 500 --save run.json
+    python loadgen.py traffic.jsonl --baseline run.json   # compare à un run
+    python loadgen.py traffic.jsonl --http 127.0.0.1:8000 # contre server.py
+"""
+
+import argparse
+import json
+import platform
+import queue
+import random
+import sys
+import threading
+import time
+
+from benchmarks import GREETINGS, PROMPT_WORDS, make_typo, percentile
+
+WORKERS = 4
+SEED = 1234
+
+# Mélange du journal généré : salutations exactes, avec typos, prompts longs
+TRAFFIC_MIX = {"greeting": 0.70, "typo": 0.15, "prompt": 0.15}
+PROMPT_LENGTHS = (10, 30, 80, 200)
+
+
+# ============================================================================
+# JOURNAL
+# ============================================================================
+
+def generate_log(path, count, seed=SEED, mix=TRAFFIC_MIX):
+    """
+    Écrit un journal synthétique reproductible de count requêtes
+    Retourne le nombre de requêtes de chaque sorte
+    """
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    written = dict.fromkeys(kinds, 0)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            kind = rng.choices(kinds, weights)[0]
+            if kind == "greeting":
+                message = rng.choice(GREETINGS)
+            elif kind == "typo":
+                message = " ".join(make_typo(word, rng, 1)
+                                   for word in rng.choice(GREETINGS).split())
+            else:
+                length = rng.choice(PROMPT_LENGTHS)
+                message = " ".join(rng.choice(PROMPT_WORDS) for _ in range(length))
+            written[kind] += 1
+            f.write(json.dumps({"id": i, "message": message}) + "\n")
+    return written
+
+
+def read_log(path):
+    """
+    Messages du journal, dans l'ordre (lignes vides ignorées)
+    """
+    from router import parse_record
+
+    messages = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                messages.append(parse_record(line)[1])
+            except ValueError as error:
+                raise ValueError(f"{path}:{number}: {error}") from None
+    return messages
+
+
+# ============================================================================
+# REJEU
+# ============================================================================
+
+def replay(messages, route, workers=WORKERS, rate=None):
+    """
+    Envoie les messages à route(message) -> décision depuis workers threads
+    Retourne [(tier, latence en s)] dans l'ordre du journal et la durée totale
+    """
+    jobs = queue.Queue()
+    for job in enumerate(messages):
+        jobs.put(job)
+    results = [None] * len(messages)
+    clock = time.perf_counter
+    start = clock()
+
+    def work():
+        while True:
+            try:
+                i, message = jobs.get_nowait()
+            except queue.Empty:
+                return
+            if rate:
+                scheduled = start + i / rate
+                delay = scheduled - clock()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled = clock()
+            try:
+                tier = route(message)["tier"]
+            except Exception:
+                tier = "error"
+            results[i] = (tier, clock() - scheduled)
+
+    threads = [threading.Thread(target=work, name=f"loadgen-{n}", daemon=True)
+               for n in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, clock() - start
+
+
+def _latencies(latencies):
+    latencies = sorted(latency * 1000 for latency in latencies)
+    return {
+        "p50_ms": percentile(latencies, 0.50),
+        "p90_ms": percentile(latencies, 0.90),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+def summarize(results, duration, workers, rate, target):
+    """
+    Débit, percentiles de latence de bout en bout et part de chaque tier
+    """
+    by_tier = {}
+    for tier, latency in results:
+        by_tier.setdefault(tier, []).append(latency)
+    total = len(results)
+    return {
+        "target": target,
+        "workers": workers,
+        "rate": rate,
+        "python": platform.python_version(),
+        "requests": total,
+        "duration_s": duration,
+        "throughput_rps": total / duration if duration else 0.0,
+        "latency": _latencies([latency for _, latency in results]),
+        "tiers": {
+            tier: {"count": len(latencies), "share": len(latencies) / total,
+                   **_latencies(latencies)}
+            for tier, latencies in sorted(by_tier.items())
+        },
+    }
+
+
+def run(messages, workers=WORKERS, rate=None, http=None, warm=True):
+    """
+    Rejoue messages dans le pipeline local, ou contre http = (host, port)
+    warm : charge le modèle avant de démarrer le chronomètre
+    """
+    if http:
+        import server
+        host, port = http
+
+        def route(message):
+            return server.route_via_http(message, host, port)
+
+        target = f"http://{host}:{port}"
+    else:
+        import router
+        route = router.route_message
+        target = "router"
+        if warm:
+            import model_interface
+            model_interface.ensure_model_loaded()
+
+    results, duration = replay(messages, route, workers, rate)
+    return summarize(results, duration, workers, rate, target)
+
+
+# ============================================================================
+# RAPPORT
+# ============================================================================
+
+def print_report(report, baseline=None):
+    def change(value, reference):
+        if not reference:
+            return ""
+        return f"  ({value / reference - 1:+.1%})"
+
+    print(f"{report['requests']} requêtes en {report['duration_s']:.2f}s, "
+          f"{report['workers']} workers, cible {report['target']}"
+          + (f", {report['rate']:g} req/s" if report["rate"] else ", débit max"))
+    throughput = report["throughput_rps"]
+    print(f"débit : {throughput:.1f} req/s"
+          + change(throughput, (baseline or {}).get("throughput_rps")))
+
+    print(f"\n{'tier':10s} {'part':>7s} {'p50 ms':>9s} {'p90 ms':>9s} "
+          f"{'p99 ms':>9s} {'max ms':>9s}")
+    rows = [("total", 1.0, report["latency"], (baseline or {}).get("latency"))]
+    for tier, row in report["tiers"].items():
+        reference = (baseline or {}).get("tiers", {}).get(tier)
+        rows.append((tier, row["share"], row, reference))
+    for name, share, row, reference in rows:
+        line = (f"{name:10s} {share:7.1%} {row['p50_ms']:9.2f} {row['p90_ms']:9.2f} "
+                f"{row['p99_ms']:9.2f} {row['max_ms']:9.2f}")
+        if reference:
+            line += f"  p99{change(row['p99_ms'], reference['p99_ms'])}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu d'un journal de requêtes JSONL")
+    parser.add_argument("log", help="journal JSONL (une requête par ligne)")
+    parser.add_argument("--generate", type=int, metavar="N",
+                        help="écrit d'abord un journal mixte synthétique de N requêtes")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--rate", type=float, help="requêtes/s visées (défaut : débit max)")
+    parser.add_argument("--http", metavar="HOST:PORT", help="cible un serveur server.py")
+    parser.add_argument("--cold", action="store_true",
+                        help="ne charge pas le modèle avant la mesure")
+    parser.add_argument("--save", help="fichier JSON où écrire les résultats")
+    parser.add_argument("--baseline", help="résultats JSON d'un run précédent")
+    args = parser.parse_args()
+
+    if args.generate:
+        written = generate_log(args.log, args.generate, args.seed)
+        print(f"📝 {args.log} : {written}")
+
+    http = None
+    if args.http:
+        host, _, port = args.http.rpartition(":")
+        http = (host or "127.0.0.1", int(port))
+
+    messages = read_log(args.log)
+    if not messages:
+        print(f"❌ Aucune requête dans {args.log} (voir --generate)")
+        return 2
+
+    report = run(messages, args.workers, args.rate, http, warm=not args.cold)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Résultats enregistrés dans {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,178 @@
-from rich.console import Console
-from rich.panel import Panel
-import importlib
+import json
+import shutil
+import sys
 import respond
-from model_interface import call_ai_model
+import instrumentation
+from router import route_frugal
+from tokenizer import analyze
 
-console = Console()
+# Démarrage frugal : rich, numpy, scikit-learn, joblib et readline ne sont
+# importés qu'au premier message qui en a besoin (voir benchmarks.py
+# --startup pour le budget de démarrage)
 
-console.print(Panel("Welcome! What can I do for you?", 
-                    title="Frugal AI ChatBot", 
-                    border_style="cyan"))
+# Charger le modèle IA en arrière-plan dès le démarrage
+# (False : chargement seulement au premier message qui en a besoin ;
+# la plupart des sessions ne dépassent pas le tier frugal)
+WARM_UP_MODEL = False
 
-while True:
-    user_input = input("\nYou: ")
+# Rechargement automatique des réponses / keywords modifiés sur disque
+WATCH_DATA_FILES = True
+
+# Chronométrage par étape pour la commande "stats"
+STATS_ENABLED = True
+
+# Couleurs ANSI pour les sorties du tier frugal (sans rich)
+ANSI_STYLES = {
+    "cyan": "36",
+    "green": "32",
+    "yellow": "33",
+    "bold": "1",
+    "bold cyan": "1;36",
+}
+
+def styled(text, style):
+    if style and sys.stdout.isatty():
+        return f"\033[{ANSI_STYLES[style]}m{text}\033[0m"
+    return text
+
+def print_panel(message, title, border_style="cyan"):
+    """
+    Même rendu qu'un rich Panel (titre centré, pleine largeur), sans rich
+    """
+    inner = shutil.get_terminal_size((80, 24)).columns - 2
+    title = f" {title} "
+    left = (inner - len(title)) // 2
+    print(styled("╭" + "─" * left, border_style) + title
+          + styled("─" * (inner - left - len(title)) + "╮", border_style))
+    print(styled("│", border_style) + f" {message}".ljust(inner) + styled("│", border_style))
+    print(styled("╰" + "─" * inner + "╯", border_style))
+
+_console = None
+
+def get_console():
+    """
+    Console rich, créée (et importée) à la première utilisation
+    """
+    global _console
+    if _console is None:
+        from render import console
+        _console = console
+    return _console
+
+def run_repl():
+    """
+    Mode interactif (chat dans le terminal)
+    """
+    # Édition de ligne / historique pour input()
+    import readline
     
-    # Commande reload
-    if user_input.lower() == "reload":
-        importlib.reload(respond)
-        console.print("[green]✓ Code reloaded![/green]")
-        continue
+    print_panel("Welcome! What can I do for you?", title="Frugal AI ChatBot")
     
-    # Validation du message
-    if not respond.is_valid_message(user_input):
-        console.print("[yellow]Please enter a valid message.[/yellow]")
-        continue
+    if WARM_UP_MODEL:
+        import model_interface
+        model_interface.warm_up()
     
-    # Détecter la catégorie avec l'algo simple
-    category = respond.detect_category(user_input)
+    if WATCH_DATA_FILES:
+        respond.start_watcher()
     
-    # Si catégorie détectée → réponse simple (FRUGAL !)
-    if category:
-        bot_response = respond.respond(user_input)
-        console.print(f"[bold cyan]Bot:[/bold cyan] {bot_response}")
-    else:
-        # Pas de catégorie → utiliser le modèle IA
-        console.print("[yellow]🤖 Redirecting to AI model...[/yellow]")
-        call_ai_model(user_input)  # N'affiche plus "Bot: None"
+    instrumentation.enable(STATS_ENABLED)
     
-    # Si au revoir, quitter
-    if category == "reply_goodbye":
-        break
\ No newline at end of file
+    while True:
+        user_input = input("\nYou: ")
+        
+        # Commande reload (seuls les fichiers modifiés sont relus)
+        if user_input.lower() == "reload":
+            changed = respond.reload_data()
+            if changed:
+                print(styled(f"✓ Reloaded: {', '.join(changed)}", "green"))
+            else:
+                print(styled("✓ Nothing changed", "green"))
+            continue
+        
+        # Commande stats
+        if user_input.lower() == "stats":
+            print_stats()
+            continue
+        
+        # Validation + catégorie avec l'algo simple (router.py)
+        # Analyse unique du message, réutilisée par le modèle IA si besoin
+        text = analyze(user_input)
+        decision = route_frugal(text)
+        category = decision["category"] if decision else None
+        
+        if decision and decision["tier"] == "invalid":
+            print(styled("Please enter a valid message.", "yellow"))
+            continue
+        
+        # Si catégorie détectée → réponse simple (FRUGAL !)
+        if category:
+            print(f"{styled('Bot:', 'bold cyan')} {decision['reply']}")
+        else:
+            # Pas de catégorie → utiliser le modèle IA
+            # (premier passage : import de numpy / scikit-learn / rich)
+            print(styled("🤖 Redirecting to AI model...", "yellow"))
+            from model_interface import call_ai_model
+            from render import render_classification
+            render_classification(call_ai_model(text))
+        
+        # Si au revoir, quitter
+        if category == "reply_goodbye":
+            break
+
+def print_stats():
+    """
+    Compteurs, part de chaque tier et latences p50/p95/p99 par étape
+    """
+    from rich.table import Table
+    
+    console = get_console()
+    stats = instrumentation.snapshot()
+    counters = stats["counters"]
+    
+    ratios = instrumentation.tier_ratios(counters)
+    tiers = " | ".join(f"{tier}: {counters['tier.' + tier]} ({ratio:.0%})"
+                       for tier, ratio in sorted(ratios.items()))
+    console.print(f"[bold]Tiers:[/bold] {tiers or 'aucun message'}")
+    if "cache.hit" in counters or "cache.miss" in counters:
+        console.print(f"[bold]Cache IA:[/bold] {counters.get('cache.hit', 0)} hits, "
+                      f"{counters.get('cache.miss', 0)} misses")
+    # Modèle jamais chargé : pas de stats de quasi-doublons (et pas d'import)
+    model_interface = sys.modules.get("model_interface")
+    index = model_interface.near_duplicates if model_interface else None
+    if index is not None:
+        near = index.stats()
+        console.print(f"[bold]Quasi-doublons:[/bold] {near['hits']}/{near['lookups']} "
+                      f"réutilisés ({near['hit_ratio']:.0%}), "
+                      f"{near['false_reuses']}/{near['audits']} audits faux "
+                      f"(distance ≤ {near['max_distance']})")
+    
+    table = Table(title="Latence par étape (ms)")
+    for column in ("étape", "count", "moyenne", "p50", "p95", "p99"):
+        table.add_column(column, justify="left" if column == "étape" else "right")
+    for stage, s in stats["stages"].items():
+        table.add_row(stage, str(s["count"]), f"{s['mean_ms']:.3f}",
+                      f"{s['p50_ms']:.3f}", f"{s['p95_ms']:.3f}", f"{s['p99_ms']:.3f}")
+    console.print(table)
+
+def run_jsonl(stdin=sys.stdin, stdout=sys.stdout):
+    """
+    Mode pipeline : un message JSON par ligne sur stdin,
+    une décision JSON par ligne sur stdout (voir router.route_stream_groups)
+    stdout est vidé après chaque groupe : un lot IA n'attend pas la fin du flux
+    """
+    from router import route_stream_groups
+    
+    if WARM_UP_MODEL:
+        import model_interface
+        model_interface.warm_up()
+    
+    for group in route_stream_groups(stdin):
+        for decision in group:
+            stdout.write(json.dumps(decision, ensure_ascii=False) + "\n")
+        stdout.flush()
+
+if __name__ == "__main__":
+    if "--jsonl" in sys.argv[1:]:
+        run_jsonl()
+    else:
+        run_repl()
@@ -0,0 +1,444 @@
+"""
+Format d'export du modèle partageable entre processus
+=====================================================
+Les .pkl sont dépicklés dans chaque processus (une copie privée par
+worker). Ici on exporte les tableaux du vectorizer et du classifieur en
+.npy bruts, rechargés avec np.load(mmap_mode='r') : N workers sur la même
+machine partagent les mêmes pages physiques (page cache de l'OS).
+
+Contenu du dossier :
+- meta.json        : paramètres du vectorizer, classes, empreinte des .pkl
+- vocabulary.txt   : un terme par ligne, dans l'ordre des colonnes
+- idf.npy          : poids IDF
+- coef.npy         : coefficients du classifieur (n_classes x n_features)
+- intercept.npy    : biais du classifieur
+- scorer_weights.npy : idf x coef transposé (n_features x n_classes), pour
+  fast_scorer : mmappé lui aussi, au lieu d'une copie float64 par worker
+
+Variante compacte (export_compact) : les termes du vocabulaire qui pèsent
+le moins dans la décision sont retirés, et les coefficients sont quantifiés
+en float16, ou en int8 avec un facteur d'échelle par classe
+(coef_scale.npy). Même dossier, même chargement : load_artifact
+déquantifie, et load_model_files l'utilise comme n'importe quel artefact.
+
+Usage :
+    python model_artifact.py export   # .pkl -> model_artifact/
+    python model_artifact.py verify   # prédictions identiques aux .pkl ?
+    python model_artifact.py compact [dossier] [part gardée] [int8|float16]
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+from ai_cache import files_fingerprint
+
+ARTIFACT_DIR = 'model_artifact'
+ARTIFACT_FORMAT = 1
+
+# Artefact compact : part du vocabulaire gardée et type des coefficients
+COMPACT_DIR = 'model_compact'
+COMPACT_KEEP_RATIO = 0.8
+COMPACT_DTYPE = 'int8'
+
+MODEL_PATH = 'exercise_classifier_balanced.pkl'
+VECTORIZER_PATH = 'tfidf_vectorizer_balanced.pkl'
+
+# Prompts de vérification (en plus de ceux passés par l'appelant)
+VERIFY_PROMPTS = [
+    "Imagine a creative story",
+    "Solve 3x + 2 = 11 for x",
+    "What is the capital of France? A) Paris B) Rome C) Madrid",
+    "Rewrite this paragraph to make it more concise",
+    "Give me a recipe for pancakes",
+    "Write a poem of exactly four lines without the letter e",
+    "Using the document below, answer the question about the treaty",
+    "Learn these ten words by heart",
+    "",
+]
+
+
+def _json_params(params):
+    """
+    Garde les paramètres sérialisables en JSON (dtype -> nom)
+    """
+    result = {}
+    for name, value in params.items():
+        if name == "dtype":
+            result[name] = np.dtype(value).name
+        elif isinstance(value, tuple):
+            result[name] = list(value)
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            result[name] = value
+        else:
+            raise ValueError(f"Paramètre non exportable : {name}={value!r}")
+    return result
+
+
+def export_artifact(model, vectorizer, directory=ARTIFACT_DIR, source_files=None):
+    """
+    Écrit le vectorizer TF-IDF et le classifieur linéaire dans directory
+    source_files : .pkl d'origine, pour détecter un artefact périmé
+    """
+    if not hasattr(model, "coef_") or not hasattr(vectorizer, "idf_"):
+        raise ValueError("Seuls TfidfVectorizer + classifieur linéaire sont exportables")
+
+    os.makedirs(directory, exist_ok=True)
+
+    _write_vocabulary(directory, _terms(vectorizer))
+    np.save(os.path.join(directory, "idf.npy"), np.ascontiguousarray(vectorizer.idf_))
+    np.save(os.path.join(directory, "coef.npy"), np.ascontiguousarray(model.coef_))
+    np.save(os.path.join(directory, "intercept.npy"), np.ascontiguousarray(model.intercept_))
+    _write_scorer_weights(directory, model.coef_, vectorizer.idf_)
+
+    return _write_meta(model, vectorizer, directory, source_files)
+
+
+def _write_scorer_weights(directory, coef, idf):
+    # Mêmes tableaux float64 que ceux que load_artifact rend : fast_scorer
+    # donne alors exactement le même résultat qu'en les recalculant
+    from fast_scorer import scorer_weights
+    np.save(os.path.join(directory, "scorer_weights.npy"), scorer_weights(coef, idf))
+
+
+def load_scorer_weights(directory, mmap_mode='r'):
+    """
+    Poids précalculés de fast_scorer (memmap), ou None si l'artefact n'en a pas
+    """
+    try:
+        return np.load(os.path.join(directory, "scorer_weights.npy"), mmap_mode=mmap_mode)
+    except FileNotFoundError:
+        return None
+
+
+def _terms(vectorizer):
+    """
+    Termes du vocabulaire dans l'ordre des colonnes
+    """
+    vocabulary = vectorizer.vocabulary_
+    terms = [None] * len(vocabulary)
+    for term, index in vocabulary.items():
+        terms[index] = term
+    return terms
+
+
+def _write_vocabulary(directory, terms):
+    with open(os.path.join(directory, "vocabulary.txt"), "w", encoding="utf-8") as f:
+        for term in terms:
+            f.write(term + "\n")
+
+
+def _write_meta(model, vectorizer, directory, source_files, compact=None):
+    meta = {
+        "format": ARTIFACT_FORMAT,
+        "vectorizer": type(vectorizer).__name__,
+        "vectorizer_params": _json_params(vectorizer.get_params()),
+        "model": type(model).__name__,
+        "model_params": _json_params(
+            {k: v for k, v in model.get_params().items()
+             if v is None or isinstance(v, (str, int, float, bool, tuple))}
+        ),
+        "classes": [str(c) for c in model.classes_],
+        "source_fingerprint": files_fingerprint(source_files) if source_files else None,
+    }
+    if compact is not None:
+        meta["compact"] = compact
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    return meta
+
+
+def _document_frequency(idf):
+    """
+    Part des documents d'entraînement contenant chaque terme, à une
+    constante près : idf = ln(n / df) + 1 (lissé ou non)
+    """
+    return np.exp(1.0 - idf)
+
+
+def export_compact(model, vectorizer, directory=COMPACT_DIR, source_files=None,
+                   keep_ratio=COMPACT_KEEP_RATIO, dtype=COMPACT_DTYPE):
+    """
+    Artefact élagué + quantifié
+    - garde la part keep_ratio des termes au plus fort poids attendu :
+      fréquence documentaire x idf x écart entre classes (ordre conservé)
+    - coefficients en float16, ou en int8 avec une échelle par classe
+    """
+    if not hasattr(model, "coef_") or not hasattr(vectorizer, "idf_"):
+        raise ValueError("Seuls TfidfVectorizer + classifieur linéaire sont exportables")
+    if dtype not in ("int8", "float16"):
+        raise ValueError(f"Type de quantification inconnu : {dtype}")
+    if not 0 < keep_ratio <= 1:
+        raise ValueError("keep_ratio doit être dans ]0, 1]")
+
+    os.makedirs(directory, exist_ok=True)
+
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    idf = np.asarray(vectorizer.idf_, dtype=np.float64)
+    weight = _document_frequency(idf) * idf * (coef.max(axis=0) - coef.min(axis=0))
+    n_kept = max(1, int(round(len(weight) * keep_ratio)))
+    kept = np.sort(np.argsort(-weight, kind="stable")[:n_kept])
+
+    terms = _terms(vectorizer)
+    _write_vocabulary(directory, [terms[i] for i in kept])
+    np.save(os.path.join(directory, "idf.npy"), idf[kept].astype(np.float32))
+
+    coef = coef[:, kept]
+    if dtype == "int8":
+        scale = np.abs(coef).max(axis=1) / 127
+        scale[scale == 0] = 1.0
+        quantized = np.round(coef / scale[:, None]).astype(np.int8)
+        np.save(os.path.join(directory, "coef_scale.npy"), scale.astype(np.float32))
+    else:
+        quantized = coef.astype(np.float16)
+        scale_path = os.path.join(directory, "coef_scale.npy")
+        if os.path.exists(scale_path):
+            os.remove(scale_path)
+    np.save(os.path.join(directory, "coef.npy"), np.ascontiguousarray(quantized))
+    np.save(os.path.join(directory, "intercept.npy"), np.ascontiguousarray(model.intercept_))
+    # Poids calculés depuis les valeurs déquantifiées, comme au chargement
+    dequantized = quantized.astype(np.float64)
+    if dtype == "int8":
+        dequantized *= scale.astype(np.float32).astype(np.float64)[:, None]
+    _write_scorer_weights(directory, dequantized,
+                          idf[kept].astype(np.float32).astype(np.float64))
+
+    return _write_meta(model, vectorizer, directory, source_files, compact={
+        "dtype": dtype,
+        "keep_ratio": keep_ratio,
+        "features_before": len(terms),
+        "features_after": int(n_kept),
+    })
+
+
+def read_meta(directory=ARTIFACT_DIR):
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_artifact(directory=ARTIFACT_DIR, mmap_mode='r'):
+    """
+    Recharge (model, vectorizer) scikit-learn depuis un artefact
+    Les gros tableaux restent des memmaps en lecture seule (pas de copie),
+    sauf pour un artefact compact, déquantifié en float64 au chargement
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    meta = read_meta(directory)
+    if meta["format"] != ARTIFACT_FORMAT:
+        raise ValueError(f"Format d'artefact inconnu : {meta['format']}")
+
+    with open(os.path.join(directory, "vocabulary.txt"), encoding="utf-8") as f:
+        vocabulary = {line.rstrip("\n"): index for index, line in enumerate(f)}
+
+    params = dict(meta["vectorizer_params"])
+    params["ngram_range"] = tuple(params["ngram_range"])
+    params["dtype"] = np.dtype(params["dtype"]).type
+    vectorizer = TfidfVectorizer(**params)
+    vectorizer.vocabulary_ = vocabulary
+    idf = np.load(os.path.join(directory, "idf.npy"), mmap_mode=mmap_mode)
+    coef = np.load(os.path.join(directory, "coef.npy"), mmap_mode=mmap_mode)
+
+    compact = meta.get("compact")
+    if compact is not None:
+        idf = idf.astype(np.float64)
+        coef = coef.astype(np.float64)
+        if compact["dtype"] == "int8":
+            scale = np.load(os.path.join(directory, "coef_scale.npy"))
+            coef *= scale.astype(np.float64)[:, None]
+
+    vectorizer.idf_ = idf
+
+    model = LogisticRegression()
+    model.classes_ = np.array(meta["classes"], dtype=object)
+    model.coef_ = coef
+    model.intercept_ = np.load(os.path.join(directory, "intercept.npy"), mmap_mode=mmap_mode)
+    model.n_features_in_ = model.coef_.shape[1]
+
+    return model, vectorizer
+
+
+def artifact_is_fresh(directory=ARTIFACT_DIR, source_files=(MODEL_PATH, VECTORIZER_PATH)):
+    """
+    True si l'artefact existe et a été exporté depuis ces .pkl
+    """
+    try:
+        meta = read_meta(directory)
+    except FileNotFoundError:
+        return False
+    return (meta.get("format") == ARTIFACT_FORMAT
+            and meta.get("source_fingerprint") == files_fingerprint(source_files))
+
+
+def load_model_files(model_path=MODEL_PATH, vectorizer_path=VECTORIZER_PATH,
+                     artifact_dir=ARTIFACT_DIR):
+    """
+    Charge (model, vectorizer, source) : l'artefact mmap s'il est à jour,
+    sinon les .pkl d'origine
+    """
+    if artifact_dir and artifact_is_fresh(artifact_dir, (model_path, vectorizer_path)):
+        model, vectorizer = load_artifact(artifact_dir)
+        return model, vectorizer, artifact_dir
+
+    import joblib
+    model = joblib.load(model_path)
+    vectorizer = joblib.load(vectorizer_path)
+    return model, vectorizer, "pkl"
+
+
+def verify_artifact(directory=ARTIFACT_DIR, prompts=None,
+                    model_path=MODEL_PATH, vectorizer_path=VECTORIZER_PATH):
+    """
+    Compare les prédictions de l'artefact avec celles des .pkl d'origine
+    Retourne un rapport ; report["identical"] est False au moindre écart
+    """
+    import joblib
+
+    prompts = list(VERIFY_PROMPTS) + list(prompts or [])
+    ref_model = joblib.load(model_path)
+    ref_vectorizer = joblib.load(vectorizer_path)
+    model, vectorizer = load_artifact(directory)
+
+    ref_X = ref_vectorizer.transform(prompts)
+    X = vectorizer.transform(prompts)
+    ref_probas = ref_model.predict_proba(ref_X)
+    probas = model.predict_proba(X)
+    ref_predictions = ref_model.predict(ref_X)
+    predictions = model.predict(X)
+
+    same_features = (ref_X != X).nnz == 0
+    same_predictions = [str(a) for a in ref_predictions] == [str(b) for b in predictions]
+    same_probas = np.array_equal(ref_probas, probas)
+
+    return {
+        "prompts": len(prompts),
+        "identical_features": bool(same_features),
+        "identical_predictions": bool(same_predictions),
+        "identical_probas": bool(same_probas),
+        "max_proba_diff": float(np.max(np.abs(ref_probas - probas))),
+        "memory_mapped": isinstance(model.coef_, np.memmap),
+        "identical": bool(same_features and same_predictions and same_probas),
+    }
+
+
+# ============================================================================
+# ARTEFACT COMPACT : RAPPORT
+# ============================================================================
+
+def heldout_prompts(vectorizer, count=2000, seed=0):
+    """
+    Prompts synthétiques reproductibles : 3 à 12 mots du vocabulaire
+    complet (termes élagués compris), tirés selon leur fréquence dans le
+    corpus d'entraînement, pour comparer les deux modèles
+    """
+    import random
+    idf = np.asarray(vectorizer.idf_, dtype=np.float64)
+    words = sorted((term, index) for term, index in vectorizer.vocabulary_.items()
+                   if " " not in term)
+    frequencies = _document_frequency(idf[[index for _, index in words]]).tolist()
+    words = [term for term, _ in words]
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(words, frequencies, k=rng.randint(3, 12)))
+            for _ in range(count)]
+
+
+def _directory_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for name in os.listdir(directory))
+
+
+def _best_time(function, repeat):
+    import time
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare_compact(directory=COMPACT_DIR, prompts=None, repeat=5,
+                    model_path=MODEL_PATH, vectorizer_path=VECTORIZER_PATH):
+    """
+    Compare l'artefact compact aux .pkl d'origine : taille, temps de
+    chargement, latence par prompt (fast_scorer) et accord top-1
+    prompts : jeu de test (par défaut VERIFY_PROMPTS + heldout_prompts)
+    """
+    import joblib
+    from fast_scorer import build_fast_scorer
+
+    ref_model = joblib.load(model_path)
+    ref_vectorizer = joblib.load(vectorizer_path)
+    model, vectorizer = load_artifact(directory)
+    if prompts is None:
+        prompts = list(VERIFY_PROMPTS) + heldout_prompts(ref_vectorizer)
+    prompts = list(prompts)
+
+    ref_load = _best_time(lambda: (joblib.load(model_path), joblib.load(vectorizer_path)),
+                          repeat)
+    load = _best_time(lambda: load_artifact(directory), repeat)
+
+    ref_scorer = build_fast_scorer(ref_model, ref_vectorizer)
+    scorer = build_fast_scorer(model, vectorizer)
+    sample = prompts[:500]
+    ref_latency = _best_time(lambda: [ref_scorer.predict(p) for p in sample], repeat) / len(sample)
+    latency = _best_time(lambda: [scorer.predict(p) for p in sample], repeat) / len(sample)
+
+    ref_probas = ref_model.predict_proba(ref_vectorizer.transform(prompts))
+    probas = model.predict_proba(vectorizer.transform(prompts))
+    agreement = float(np.mean(ref_probas.argmax(axis=1) == probas.argmax(axis=1)))
+
+    meta = read_meta(directory)
+    ref_size = os.path.getsize(model_path) + os.path.getsize(vectorizer_path)
+    size = _directory_size(directory)
+    return {
+        "prompts": len(prompts),
+        "dtype": meta["compact"]["dtype"],
+        "features": f"{meta['compact']['features_after']}/{meta['compact']['features_before']}",
+        "size_kb": f"{size / 1024:.0f} (pkl {ref_size / 1024:.0f}, -{1 - size / ref_size:.0%})",
+        "load_ms": f"{load * 1000:.1f} (pkl {ref_load * 1000:.1f})",
+        "latency_us": f"{latency * 1e6:.1f} (pkl {ref_latency * 1e6:.1f})",
+        "max_proba_diff": float(np.max(np.abs(ref_probas - probas))),
+        "top1_agreement": agreement,
+    }
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    default_dir = COMPACT_DIR if command == "compact" else ARTIFACT_DIR
+    directory = sys.argv[2] if len(sys.argv) > 2 else default_dir
+
+    if command == "compact":
+        import joblib
+        keep_ratio = float(sys.argv[3]) if len(sys.argv) > 3 else COMPACT_KEEP_RATIO
+        dtype = sys.argv[4] if len(sys.argv) > 4 else COMPACT_DTYPE
+        export_compact(joblib.load(MODEL_PATH), joblib.load(VECTORIZER_PATH), directory,
+                       source_files=(MODEL_PATH, VECTORIZER_PATH),
+                       keep_ratio=keep_ratio, dtype=dtype)
+        print(f"✅ Artefact compact écrit dans {directory}/")
+        for name, value in compare_compact(directory).items():
+            print(f"  {name:22s}: {value}")
+        sys.exit(0)
+
+    if command == "export":
+        import joblib
+        meta = export_artifact(joblib.load(MODEL_PATH), joblib.load(VECTORIZER_PATH),
+                               directory, source_files=(MODEL_PATH, VECTORIZER_PATH))
+        print(f"✅ Artefact écrit dans {directory}/ ({len(meta['classes'])} classes)")
+        command = "verify"
+
+    if command == "verify":
+        report = verify_artifact(directory)
+        for name, value in report.items():
+            print(f"  {name:22s}: {value}")
+        if not report["identical"]:
+            print("❌ L'artefact ne donne pas les mêmes prédictions que les .pkl")
+            sys.exit(1)
+        print("✅ Prédictions identiques aux .pkl")
+    else:
+        print(f"Commande inconnue : {command} (export | verify | compact)")
+        sys.exit(2)
@@ -1,15 +1,207 @@
-import joblib
+import json
+import os
+import threading
+import time
 import numpy as np
-from rich.console import Console
-from rich.panel import Panel
+from collections import namedtuple
+from ai_cache import ResultCache, normalize_cache_key
+import instrumentation
+from tokenizer import Text, analyze, raw_text
 
-console = Console()
+MODEL_PATH = 'exercise_classifier_balanced.pkl'
+VECTORIZER_PATH = 'tfidf_vectorizer_balanced.pkl'
 
-# Charger le modèle au démarrage
-print("📥 Chargement du modèle IA...")
-model = joblib.load('exercise_classifier_balanced.pkl')
-vectorizer = joblib.load('tfidf_vectorizer_balanced.pkl')
-print(f"✅ Modèle IA chargé : {len(model.classes_)} classes")
+# Cache des résultats (LRU mémoire + SQLite sur disque)
+# RESULT_CACHE = False : jamais ouvert (process qui n'appellent classify_batch
+# qu'avec use_cache=False, comme les workers de batch_predict.py)
+RESULT_CACHE = True
+CACHE_PATH = 'ai_cache.sqlite3'
+CACHE_MAX_ENTRIES = 1024
+
+# Artefact memory-mappable (python model_artifact.py export)
+# Utilisé à la place des .pkl quand il a été exporté depuis ces mêmes .pkl
+# 'model_compact' (python model_artifact.py compact) : vocabulaire élagué et
+# poids quantifiés, prédictions approchées (voir le rapport d'accord top-1)
+MODEL_ARTIFACT_DIR = 'model_artifact'
+
+# Manifeste écrit par train.py à côté des .pkl : s'il existe, les .pkl et
+# les classes chargés doivent lui correspondre (chemin relatif au dossier
+# de MODEL_PATH, comme dans model_trained/)
+MODEL_MANIFEST_PATH = 'model_manifest.json'
+
+# Chemin rapide (fast_scorer.py) pour un seul prompt court, sans sklearn
+FAST_PATH = True
+FAST_PATH_MAX_CHARS = 2000
+
+# Réutilisation des quasi-doublons (near_duplicates.py) : distance de
+# Hamming max entre empreintes SimHash, taille de l'index, part auditée
+# Désactivée par défaut : une réutilisation peut être fausse (voir le taux
+# de fausses réutilisations dans /stats avant de l'activer)
+NEAR_DUPLICATES = False
+NEAR_DUPLICATE_MAX_DISTANCE = 3
+NEAR_DUPLICATE_MAX_ENTRIES = 10000
+NEAR_DUPLICATE_AUDIT_RATE = 0.05
+
+# Le modèle est chargé à la première utilisation (ou par warm_up)
+model = None
+vectorizer = None
+fast_scorer = None
+result_cache = None
+near_duplicates = None
+
+# Signal "modèle prêt" : les requêtes attendent dessus, pas sur les globals
+model_ready = threading.Event()
+_load_lock = threading.Lock()
+_load_thread = None
+_load_error = None
+
+# Durées du dernier chargement (en secondes), pour suivre le cold start
+load_timings = {}
+
+def load_model(verbose=True):
+    """
+    Charge (ou recharge) le modèle et le vectorizer depuis les .pkl
+    Remplit load_timings et débloque model_ready
+    """
+    global model, vectorizer, fast_scorer, result_cache, near_duplicates, load_timings
+    with _load_lock:
+        if verbose:
+            print("📥 Chargement du modèle IA...")
+        start = time.perf_counter()
+        
+        # Artefact mmap partagé entre workers s'il est à jour, sinon .pkl
+        from model_artifact import load_model_files
+        new_model, new_vectorizer, source = load_model_files(
+            MODEL_PATH, VECTORIZER_PATH, MODEL_ARTIFACT_DIR
+        )
+        manifest_path = manifest_location()
+        if manifest_path and os.path.exists(manifest_path):
+            from train import check_manifest
+            problems = check_manifest(manifest_path, MODEL_PATH, VECTORIZER_PATH,
+                                      new_model.classes_)
+            if problems:
+                raise ValueError(f"Modèle refusé ({manifest_path}) : "
+                                 + "; ".join(problems))
+        loaded = time.perf_counter()
+        
+        # None si le modèle n'est pas décomposable : on reste sur sklearn
+        # (poids mmappés depuis l'artefact : partagés entre workers)
+        from fast_scorer import build_fast_scorer
+        weights = None
+        if source != "pkl":
+            from model_artifact import load_scorer_weights
+            weights = load_scorer_weights(source)
+        new_scorer = build_fast_scorer(new_model, new_vectorizer, weights)
+        
+        # Empreintes liées au vectorizer : index repart de zéro à chaque chargement
+        new_index = None
+        if NEAR_DUPLICATES:
+            from near_duplicates import NearDuplicateIndex
+            new_index = NearDuplicateIndex(
+                new_vectorizer,
+                max_distance=NEAR_DUPLICATE_MAX_DISTANCE,
+                max_entries=NEAR_DUPLICATE_MAX_ENTRIES,
+                audit_rate=NEAR_DUPLICATE_AUDIT_RATE,
+            )
+        
+        model, vectorizer, fast_scorer = new_model, new_vectorizer, new_scorer
+        near_duplicates = new_index
+        
+        # Cache créé au premier chargement : son empreinte = modèle chargé
+        # (rouvert si le modèle vient d'ailleurs : .pkl, artefact, compact)
+        if not RESULT_CACHE:
+            result_cache = None
+        elif result_cache is None or result_cache.model_files != _cache_model_files(source):
+            result_cache = _open_result_cache(source)
+        end = time.perf_counter()
+        
+        load_timings = {
+            "source": source,
+            "model": loaded - start,
+            "cache": end - loaded,
+            "total": end - start,
+        }
+        model_ready.set()
+        
+        if verbose:
+            print(f"✅ Modèle IA chargé : {len(model.classes_)} classes "
+                  f"({load_timings['total']:.2f}s)")
+
+def manifest_location():
+    """
+    Manifeste attendu pour MODEL_PATH (None si la vérification est désactivée)
+    """
+    if not MODEL_MANIFEST_PATH:
+        return None
+    return os.path.join(os.path.dirname(MODEL_PATH), MODEL_MANIFEST_PATH)
+
+def _cache_model_files(source):
+    """
+    Fichiers dont dépendent les résultats : les .pkl, plus l'artefact
+    chargé à leur place (un artefact compact ne prédit pas pareil)
+    """
+    files = [MODEL_PATH, VECTORIZER_PATH]
+    if source and source != "pkl" and os.path.isdir(source):
+        files += [os.path.join(source, name) for name in sorted(os.listdir(source))]
+    return tuple(files)
+
+def _open_result_cache(source=None):
+    return ResultCache(
+        CACHE_PATH,
+        model_files=_cache_model_files(source),
+        max_entries=CACHE_MAX_ENTRIES,
+        encode=encode_classification,
+        decode=decode_classification,
+        on_invalidate=lambda: load_model(verbose=False),
+    )
+
+_inherited_caches = []
+
+def reopen_after_fork():
+    """
+    A appeler dans un process enfant juste après os.fork() (voir prefork.py)
+    Le modèle reste partagé (copy-on-write) ; seuls le verrou et la
+    connexion SQLite du cache, qui ne doivent pas traverser un fork, sont
+    recréés
+    """
+    global result_cache, _load_lock
+    _load_lock = threading.Lock()
+    if result_cache is not None:
+        # Jamais fermée ici : elle appartient au process parent
+        _inherited_caches.append(result_cache)
+        result_cache = _open_result_cache(load_timings.get("source"))
+
+def _background_load():
+    global _load_error
+    try:
+        load_model(verbose=False)
+    except Exception as error:
+        _load_error = error
+        model_ready.set()
+
+def warm_up():
+    """
+    Lance le chargement du modèle dans un thread en arrière-plan
+    Sans effet si le modèle est déjà chargé ou en cours de chargement
+    """
+    global _load_thread
+    with _load_lock:
+        if model_ready.is_set() or _load_thread is not None:
+            return
+        _load_thread = threading.Thread(target=_background_load,
+                                        name="model-warm-up", daemon=True)
+        _load_thread.start()
+
+def ensure_model_loaded(timeout=None):
+    """
+    Attend que le modèle soit prêt (lance le chargement si besoin)
+    """
+    if not model_ready.is_set():
+        warm_up()
+        if not model_ready.wait(timeout):
+            raise TimeoutError("Le modèle IA n'est pas prêt")
+    if _load_error is not None:
+        raise RuntimeError("Échec du chargement du modèle IA") from _load_error
 
 def get_difficulty_info(prediction):
     """
@@ -47,50 +239,279 @@ def get_difficulty_info(prediction):
     # Par défaut, considérer comme MOYEN si catégorie inconnue
     return "MOYEN", "yellow", "🟡"
 
-def call_ai_model(message):
+# Résultat structuré d'une classification
+# difficulty = (niveau, couleur, emoji), top_k = [(catégorie, proba), ...]
+# truncated : seul le début du prompt a été classifié (tokenizer.MAX_INPUT_*)
+Classification = namedtuple(
+    "Classification",
+    ["prediction", "confidence", "entropy", "difficulty", "top_k", "truncated"],
+    defaults=(False,)
+)
+
+def encode_classification(result):
+    return json.dumps(result._asdict())
+
+def decode_classification(text):
+    data = json.loads(text)
+    data["difficulty"] = tuple(data["difficulty"])
+    data["top_k"] = [tuple(item) for item in data["top_k"]]
+    return Classification(**data)
+
+def classify_batch(messages, top_k=3, use_cache=True):
+    """
+    Classifie une liste de messages en un seul passage :
+    un seul vectorizer.transform et un seul predict_proba
+    Retourne une liste de Classification, dans l'ordre des messages
+    
+    Avec use_cache, seuls les messages absents du cache passent par le modèle
+    Les messages peuvent être des str ou des tokenizer.Text déjà analysés
+    Les très gros messages sont tronqués (tokenizer.MAX_INPUT_CHARS / _TOKENS)
+    """
+    messages, truncated = _bound_messages(messages)
+    ensure_model_loaded()
+    if not use_cache or result_cache is None:
+        return _mark_truncated(_classify(messages, top_k), truncated)
+    
+    timed = instrumentation.ENABLED
+    if timed:
+        t = instrumentation.now()
+    
+    # Fichiers du modèle vérifiés une fois par lot, pas à chaque message
+    # (peut recharger le modèle, et donc rouvrir le cache)
+    result_cache.check_model_files()
+    cache = result_cache
+    
+    results = [None] * len(messages)
+    missing = {}
+    for i, message in enumerate(messages):
+        key = f"{top_k}:{message_cache_key(message)}"
+        if key in missing:
+            missing[key].append(i)
+            continue
+        results[i] = cache.get(key, check=False)
+        if results[i] is None:
+            missing[key] = [i]
+    
+    if timed:
+        instrumentation.lap("cache_lookup", t)
+        instrumentation.count("cache.hit", len(messages) - len(missing))
+        instrumentation.count("cache.miss", len(missing))
+    
+    # Quasi-doublons d'un prompt récent : on réutilise sa classification
+    # (hors cache exact : ce n'est qu'une approximation)
+    index = near_duplicates
+    fingerprints = {}
+    audited = {}
+    if missing and index is not None:
+        if timed:
+            t = instrumentation.now()
+        for key in list(missing):
+            fingerprint = index.fingerprint(messages[missing[key][0]])
+            fingerprints[key] = fingerprint
+            reused = _reuse_top_k(index.lookup(fingerprint)[0], top_k)
+            if reused is None:
+                continue
+            if index.should_audit():
+                # Recalculé quand même, pour mesurer les fausses réutilisations
+                audited[key] = reused
+                continue
+            for i in missing.pop(key):
+                results[i] = reused
+        if timed:
+            instrumentation.lap("near_duplicates", t)
+            instrumentation.count("near_dup.hit", len(fingerprints) - len(missing) + len(audited))
+            instrumentation.count("near_dup.miss", len(missing) - len(audited))
+    
+    if missing:
+        # Un seul passage pour tous les messages manquants (sans doublons)
+        keys = list(missing)
+        computed = _classify([messages[missing[key][0]] for key in keys], top_k)
+        for key, result in zip(keys, computed):
+            cache.put(key, result)
+            if key in audited:
+                index.record_audit(audited[key].prediction == result.prediction)
+            elif key in fingerprints:
+                index.add(key, fingerprints[key], result)
+            for i in missing[key]:
+                results[i] = result
+    
+    return _mark_truncated(results, truncated)
+
+def _reuse_top_k(reused, top_k):
+    """
+    Classification réutilisée ramenée à top_k catégories, ou None si elle
+    a été calculée avec un top_k plus petit (catégories manquantes)
+    """
+    if reused is None:
+        return None
+    if len(reused.top_k) < min(top_k, len(model.classes_)):
+        return None
+    return reused._replace(top_k=reused.top_k[:top_k])
+
+def _bound_messages(messages):
+    """
+    Messages bornés pour le vectorizer + indices des messages tronqués
+    (un Text vient déjà borné d'analyze, au point d'entrée)
+    """
+    bounded = [analyze(message) for message in messages]
+    truncated = [i for i, message in enumerate(bounded) if message.truncated]
+    if truncated and instrumentation.ENABLED:
+        instrumentation.count("input.truncated", len(truncated))
+    return bounded, truncated
+
+def _mark_truncated(results, truncated):
+    # Par requête (pas dans le cache) : le même début peut venir d'un prompt court
+    for i in truncated:
+        results[i] = results[i]._replace(truncated=True)
+    return results
+
+def message_cache_key(message):
+    if isinstance(message, Text):
+        # Déjà en minuscules : on ne compacte que les espaces
+        return " ".join(message.lower.split())
+    return normalize_cache_key(message)
+
+def _classify(messages, top_k):
+    """
+    Passage unique dans le vectorizer et le modèle (sans cache)
+    """
+    if not messages:
+        return []
+    
+    timed = instrumentation.ENABLED
+    if timed:
+        t = instrumentation.now()
+    
+    scorer = fast_scorer
+    if (FAST_PATH and scorer is not None and len(messages) == 1
+            and len(raw_text(messages[0])) <= FAST_PATH_MAX_CHARS):
+        # Un seul prompt court : lookups + somme NumPy, sans sklearn
+        # (tokens tirés de l'analyse partagée, voir tokenizer.py)
+        probas = scorer.predict_proba(messages[0])[None, :]
+        classes = scorer.classes_
+        if timed:
+            t = instrumentation.lap("fast_scorer", t)
+    else:
+        # Vectoriser tous les messages d'un coup (une seule matrice sparse)
+        text_vec = vectorizer.transform([raw_text(message) for message in messages])
+        if timed:
+            t = instrumentation.lap("vectorization", t)
+        probas = model.predict_proba(text_vec)
+        classes = model.classes_
+        if timed:
+            t = instrumentation.lap("prediction", t)
+    rows = np.arange(len(messages))
+    
+    # La prédiction est l'argmax des probabilités
+    best = probas.argmax(axis=1)
+    confidences = probas[rows, best]
+    
+    # Entropie (mesure d'incertitude), même formule que l'affichage
+    entropies = -np.sum(probas * np.log(probas + 1e-10), axis=1)
+    
+    # Top-k : argpartition puis tri des k meilleurs seulement
+    k = min(top_k, len(classes))
+    top = np.argpartition(-probas, k - 1, axis=1)[:, :k]
+    top_probas = probas[rows[:, None], top]
+    order = np.lexsort((top, -top_probas), axis=1)
+    top = top[rows[:, None], order]
+    
+    results = []
+    for i in range(len(messages)):
+        prediction = classes[best[i]]
+        results.append(Classification(
+            prediction=str(prediction),
+            confidence=float(confidences[i]),
+            entropy=float(entropies[i]),
+            difficulty=get_difficulty_info(prediction),
+            top_k=[(str(classes[j]), float(probas[i, j])) for j in top[i]],
+        ))
+    return results
+
+def call_ai_model(message, use_cache=True):
     """
     Utilise le modèle IA pour traiter les messages complexes
-    Affiche la difficulté du prompt avec une couleur
-    Retourne une réponse intelligente basée sur la prédiction
-    """
-    # Vectoriser le message
-    text_vec = vectorizer.transform([message])
-    
-    # Prédire la catégorie
-    prediction = model.predict(text_vec)[0]
-    probas = model.predict_proba(text_vec)[0]
-    
-    # Trouver la confiance
-    proba_dict = dict(zip(model.classes_, probas))
-    confidence = proba_dict[prediction]
-    
-    # Calculer l'entropie (mesure d'incertitude)
-    probas_array = np.array(probas)
-    entropy = -np.sum(probas_array * np.log(probas_array + 1e-10))
-    
-    # Obtenir les informations de difficulté (basé sur la catégorie)
-    difficulty, color, emoji = get_difficulty_info(prediction)
-    
-    # Afficher la difficulté avec style
-    console.print(Panel(
-        f"[bold]{emoji} Difficulté: [{color}]{difficulty}[/{color}][/bold]\n"
-        f"Confiance: [bold]{confidence:.1%}[/bold] | "
-        f"Entropie: [bold]{entropy:.2f}[/bold]",
-        title="📊 Analyse du Prompt",
-        border_style=color,
-        padding=(0, 1)
-    ))
-    
-    # Afficher les top 3 prédictions
-    sorted_probas = sorted(proba_dict.items(), key=lambda x: x[1], reverse=True)[:3]
-    console.print("\n[bold cyan]Top 3 prédictions:[/bold cyan]")
-    for i, (category, prob) in enumerate(sorted_probas, 1):
-        bar_length = int(prob * 20)
-        bar = "█" * bar_length + "░" * (20 - bar_length)
-        marker = "👈" if category == prediction else ""
-        console.print(f"  {i}. {category:30s} [{color}]{bar}[/{color}] {prob:5.1%} {marker}")
-    
-    console.print()  # Ligne vide pour l'espacement
-    
-    # Ne retourne rien (pas de "Bot: None")
-    return None
\ No newline at end of file
+    Retourne une Classification (prédiction, confiance, entropie,
+    difficulté, top-k) : aucun affichage ici, voir render.py pour le REPL
+    """
+    # Classifier le message (transform + predict_proba une seule fois)
+    return classify_batch([message], use_cache=use_cache)[0]
+
+# ============================================================================
+# VÉRIFICATION DE LA FEATURISATION BORNÉE
+# ============================================================================
+
+def check_bounded_featurization(prompts=None, huge_chars=5_000_000):
+    """
+    Compare le routage avec et sans bornes (tokenizer.MAX_INPUT_*, sans cache)
+    - prompts de taille normale : prédictions et probabilités identiques
+    - prompt géant, par router.route_message (point d'entrée réel) et par
+      classify_batch : tronqué, temps et pic mémoire rapportés
+    Retourne la liste des écarts (vide = conforme)
+    """
+    import random
+    import tracemalloc
+    
+    import router
+    import tokenizer
+    
+    ensure_model_loaded()
+    if prompts is None:
+        from benchmarks import PROMPT_WORDS
+        from model_artifact import VERIFY_PROMPTS
+        rng = random.Random(0)
+        prompts = list(VERIFY_PROMPTS) + [
+            " ".join(rng.choice(PROMPT_WORDS) for _ in range(length))
+            for length in (1, 5, 20, 100, 500, 1000, 2000) for _ in range(20)
+        ]
+    
+    limits = tokenizer.MAX_INPUT_CHARS, tokenizer.MAX_INPUT_TOKENS
+    
+    def set_limits(bounds):
+        tokenizer.MAX_INPUT_CHARS, tokenizer.MAX_INPUT_TOKENS = bounds
+    
+    mismatches = []
+    try:
+        set_limits((None, None))
+        reference = [classify_batch([p], use_cache=False)[0] for p in prompts]
+        set_limits(limits)
+        bounded = [classify_batch([p], use_cache=False)[0] for p in prompts]
+        for prompt, before, after in zip(prompts, reference, bounded):
+            if before != after:
+                mismatches.append((prompt[:60], before, after))
+        
+        huge = ("Solve the equation 2x + 5 = 17 and explain each step. "
+                * (huge_chars // 54 + 1))[:huge_chars]
+        # Un seul mot géant : le tier frugal ne doit pas l'examiner
+        word = ("abcdefghij" * (huge_chars // 10 + 1))[:huge_chars]
+        cases = [
+            ("route_message", lambda: router.route_message(huge)),
+            ("classify_batch", lambda: classify_batch([huge], use_cache=False)[0]._asdict()),
+            ("mot géant", lambda: router.route_message(word)),
+        ]
+        for name, bounds in (("sans bornes", (None, None)), ("bornée", limits)):
+            set_limits(bounds)
+            for case, call in cases:
+                if case == "mot géant" and bounds == (None, None):
+                    continue
+                tracemalloc.start()
+                start = time.perf_counter()
+                decision = call()
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                truncated = decision.get("truncated", False)
+                print(f"{name:12s} {case:15s}: {elapsed * 1000:8.1f} ms, "
+                      f"pic {peak / 2**20:7.1f} Mo (tronqué : {truncated})")
+                if bounds == limits and not truncated:
+                    mismatches.append((case, "tronqué attendu", decision))
+    finally:
+        set_limits(limits)
+    
+    print(f"{len(prompts)} prompts normaux, {len(mismatches)} écart(s)")
+    return mismatches
+
+if __name__ == "__main__":
+    # python model_interface.py : vérifie la featurisation bornée
+    load_model()
+    raise SystemExit(1 if check_bounded_featurization() else 0)
@@ -0,0 +1,247 @@
+"""
+Cache des quasi-doublons (SimHash + LSH par bandes)
+===================================================
+Beaucoup de prompts du tier IA sont presque identiques (même exercice avec
+un autre nombre, ponctuation finale différente...) : le cache exact les
+rate. On calcule une empreinte SimHash 64 bits à partir des tokens TF-IDF
+du vectorizer (poids = tf * idf), et on réutilise la classification d'un
+prompt récent dont l'empreinte est à distance de Hamming <= max_distance.
+
+Index LSH : l'empreinte est découpée en max_distance + 1 bandes. Deux
+empreintes à distance <= max_distance ont forcément une bande identique
+(principe des tiroirs) : chercher les bandes suffit, sans rien rater.
+
+Deux prompts avec les mêmes tokens du vocabulaire ont le même vecteur
+TF-IDF (même empreinte, même classification). L'inverse n'est pas garanti :
+des vecteurs proches peuvent aussi tomber sur la même empreinte.
+audit_rate fixe donc la part des réutilisations recalculées pour mesurer
+le taux de fausses réutilisations (prédiction différente).
+
+Usage :
+    python near_duplicates.py prompts.txt              # réglage de la distance
+    python near_duplicates.py prompts.txt --distances 0 2 4 8
+"""
+
+import argparse
+import random
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from tokenizer import feature_analyzer
+
+FINGERPRINT_BITS = 64
+MAX_DISTANCE = 3
+MAX_ENTRIES = 10000
+AUDIT_RATE = 0.05
+SEED = 0
+
+
+class NearDuplicateIndex:
+    """
+    Empreintes SimHash des prompts récents (LRU) + index LSH par bandes
+    """
+
+    def __init__(self, vectorizer, max_distance=MAX_DISTANCE, max_entries=MAX_ENTRIES,
+                 audit_rate=AUDIT_RATE, seed=SEED):
+        if not 0 <= max_distance < FINGERPRINT_BITS:
+            raise ValueError(f"max_distance must be in [0, {FINGERPRINT_BITS})")
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.audit_rate = audit_rate
+        self.random = random.Random(seed)
+
+        self.analyzer = feature_analyzer(vectorizer)
+        self.vocabulary = vectorizer.vocabulary_
+        self.idf = (np.asarray(vectorizer.idf_, dtype=np.float64) if vectorizer.use_idf
+                    else np.ones(len(self.vocabulary)))
+        # Un hyperplan aléatoire (±1 par bit) par terme du vocabulaire
+        rng = np.random.default_rng(seed)
+        self.planes = rng.choice(np.array([-1.0, 1.0]), size=(len(self.vocabulary),
+                                                              FINGERPRINT_BITS))
+        self.powers = 1 << np.arange(FINGERPRINT_BITS, dtype=np.uint64)
+
+        self.bands = max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self.band_mask = (1 << self.band_bits) - 1
+
+        self.entries = OrderedDict()    # key -> (empreinte, valeur)
+        self.buckets = {}               # (bande, valeur de bande) -> {key}
+        self.lock = threading.Lock()
+        self.counters = {
+            "lookups": 0,
+            "hits": 0,
+            "exact_hits": 0,
+            "audits": 0,
+            "false_reuses": 0,
+            "evictions": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Empreinte
+    # ------------------------------------------------------------------
+
+    def fingerprint(self, message):
+        """
+        SimHash 64 bits du vecteur TF-IDF (non normalisé) du message
+        """
+        counts = {}
+        vocabulary = self.vocabulary
+        for token in self.analyzer(message):
+            index = vocabulary.get(token)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        if not counts:
+            return 0
+
+        indices = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        weights *= self.idf[indices]
+        bits = (weights @ self.planes[indices]) > 0
+        return int(self.powers[bits].sum())
+
+    def _band_keys(self, fingerprint):
+        bits, mask = self.band_bits, self.band_mask
+        # La dernière bande prend les bits restants
+        keys = [(band, (fingerprint >> (band * bits)) & mask) for band in range(self.bands - 1)]
+        keys.append((self.bands - 1, fingerprint >> ((self.bands - 1) * bits)))
+        return keys
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def lookup(self, fingerprint):
+        """
+        Valeur du prompt récent le plus proche (distance <= max_distance)
+        Retourne (valeur, distance) ou (None, None)
+        """
+        with self.lock:
+            self.counters["lookups"] += 1
+            best, best_distance = None, None
+            seen = set()
+            for band_key in self._band_keys(fingerprint):
+                for key in self.buckets.get(band_key, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    other, value = self.entries[key]
+                    distance = (fingerprint ^ other).bit_count()
+                    if distance <= self.max_distance and (
+                            best_distance is None or distance < best_distance):
+                        best, best_distance = key, distance
+                        if distance == 0:
+                            break
+                if best_distance == 0:
+                    break
+
+            if best is None:
+                return None, None
+            self.entries.move_to_end(best)
+            self.counters["hits"] += 1
+            if best_distance == 0:
+                self.counters["exact_hits"] += 1
+            return self.entries[best][1], best_distance
+
+    def add(self, key, fingerprint, value):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (fingerprint, value)
+            for band_key in self._band_keys(fingerprint):
+                self.buckets.setdefault(band_key, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.counters["evictions"] += 1
+
+    def _remove(self, key):
+        fingerprint, _ = self.entries.pop(key)
+        for band_key in self._band_keys(fingerprint):
+            bucket = self.buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band_key]
+
+    def should_audit(self):
+        """
+        Tire au sort les réutilisations à recalculer
+        """
+        return self.random.random() < self.audit_rate
+
+    def record_audit(self, same):
+        with self.lock:
+            self.counters["audits"] += 1
+            if not same:
+                self.counters["false_reuses"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.buckets.clear()
+
+    def stats(self):
+        """
+        Compteurs + taux de réutilisation et de fausses réutilisations
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self.entries)
+        stats["max_distance"] = self.max_distance
+        stats["hit_ratio"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        stats["false_reuse_ratio"] = (stats["false_reuses"] / stats["audits"]
+                                      if stats["audits"] else 0.0)
+        return stats
+
+
+# ============================================================================
+# RÉGLAGE HORS LIGNE
+# ============================================================================
+
+def tune(prompts, model, vectorizer, distances=(0, 1, 2, 3, 4, 6, 8)):
+    """
+    Rejoue les prompts dans l'ordre pour chaque distance : taux de
+    réutilisation et taux de fausses réutilisations (toutes auditées)
+    """
+    predictions = model.predict(vectorizer.transform(prompts))
+    report = {}
+    for max_distance in distances:
+        index = NearDuplicateIndex(vectorizer, max_distance=max_distance,
+                                   max_entries=len(prompts) + 1)
+        hits = false_reuses = 0
+        for i, prompt in enumerate(prompts):
+            fingerprint = index.fingerprint(prompt)
+            reused, _ = index.lookup(fingerprint)
+            if reused is not None:
+                hits += 1
+                false_reuses += reused != predictions[i]
+            else:
+                index.add(i, fingerprint, predictions[i])
+        report[max_distance] = {
+            "hit_ratio": hits / len(prompts) if prompts else 0.0,
+            "false_reuse_ratio": false_reuses / hits if hits else 0.0,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réglage de la distance du cache de quasi-doublons")
+    parser.add_argument("prompts", help="un prompt par ligne")
+    parser.add_argument("--distances", type=int, nargs="+", default=[0, 1, 2, 3, 4, 6, 8])
+    args = parser.parse_args()
+
+    from batch_predict import read_prompts
+    from model_artifact import (ARTIFACT_DIR, MODEL_PATH, VECTORIZER_PATH,
+                                load_model_files)
+
+    model, vectorizer, _ = load_model_files(MODEL_PATH, VECTORIZER_PATH, ARTIFACT_DIR)
+    prompts = list(read_prompts(args.prompts))
+    print(f"{len(prompts)} prompts")
+    print(f"{'distance':>8}  {'réutilisés':>10}  {'faux':>8}")
+    for distance, row in tune(prompts, model, vectorizer, args.distances).items():
+        print(f"{distance:>8}  {row['hit_ratio']:>10.1%}  {row['false_reuse_ratio']:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
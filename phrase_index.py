@@ -0,0 +1,89 @@
+"""
+Index des phrases (automate d'Aho-Corasick)
+===========================================
+Les keywords à plusieurs mots ("how are you", "see you"...) sont compilés
+une fois dans un automate ; un seul passage sur le message trouve toutes
+les phrases présentes, quel que soit le nombre de phrases chargées.
+
+Même sémantique que la boucle d'origine de detect_category :
+    keyword in message   (sous-chaîne brute, sensible à la casse)
+et même priorité : la première catégorie (ordre du dict) qui a une phrase
+dans le message l'emporte.
+"""
+
+from collections import deque
+
+# Rang "aucune phrase" (plus grand que tous les rangs réels)
+NO_MATCH = float("inf")
+
+
+def build_phrase_index(keywords):
+    """
+    Compile les phrases d'une table {category: [keyword, ...]}
+    Retourne {"goto", "fail", "best", "categories"} :
+    - goto[node]  : transitions {caractère: node}
+    - fail[node]  : lien d'échec
+    - best[node]  : plus petit rang de catégorie reconnu en node
+                    (phrases terminées ici + via les liens d'échec)
+    - categories  : rang -> catégorie
+    """
+    goto = [{}]
+    best = [NO_MATCH]
+    categories = list(keywords)
+
+    for rank, keyword_list in enumerate(keywords.values()):
+        for keyword in keyword_list:
+            # Seulement les phrases (keywords avec un espace)
+            if " " not in keyword:
+                continue
+            node = 0
+            for char in keyword:
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto[node][char] = next_node
+                    goto.append({})
+                    best.append(NO_MATCH)
+                node = next_node
+            best[node] = min(best[node], rank)
+
+    # Liens d'échec en largeur : le suffixe propre le plus long qui est
+    # aussi un préfixe. best hérite du rang de ce suffixe.
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for char, child in goto[node].items():
+            state = fail[node]
+            while state and char not in goto[state]:
+                state = fail[state]
+            fallback = goto[state].get(char, 0)
+            fail[child] = fallback if fallback != child else 0
+            best[child] = min(best[child], best[fail[child]])
+            queue.append(child)
+
+    return {"goto": goto, "fail": fail, "best": best, "categories": categories}
+
+
+def find_phrase_category(index, message):
+    """
+    Catégorie la plus prioritaire dont une phrase apparaît dans message,
+    ou None. Un seul passage sur le message.
+    """
+    goto = index["goto"]
+    fail = index["fail"]
+    best = index["best"]
+
+    state = 0
+    found = NO_MATCH
+    for char in message:
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        rank = best[state]
+        if rank < found:
+            found = rank
+            if rank == 0:
+                break
+
+    return index["categories"][found] if found != NO_MATCH else None
@@ -0,0 +1,297 @@
+"""
+Superviseur pre-fork : un modèle chargé, N workers
+==================================================
+Le parent charge le classifieur et le vectorizer une seule fois, appelle
+gc.freeze() (les objets existants passent dans une génération permanente :
+le GC des enfants ne les touche plus, donc ne recopie pas leurs pages),
+ouvre la socket d'écoute puis fork N workers. Chaque worker fait tourner
+le serveur asyncio de server.py sur la socket partagée : le noyau répartit
+les connexions, et les pages du modèle restent partagées en copy-on-write.
+
+Le parent ne sert aucune requête : il relance les workers qui meurent et
+les arrête tous sur SIGINT / SIGTERM.
+
+Usage :
+    python prefork.py --workers 4 --port 8000
+    python prefork.py --memcheck --workers 4   # PSS / USS par worker
+
+--memcheck compare deux lancements : workers qui partagent le modèle du
+parent, et workers témoins qui rechargent chacun le leur (comme N serveurs
+indépendants). L'écart d'USS entre les deux est ce que le partage économise par
+worker ; il doit atteindre MEMCHECK_MIN_SHARED_RATIO de la mémoire du
+modèle, mesurée au chargement dans le parent.
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import server
+
+WORKERS = os.cpu_count() or 1
+
+# Économie minimale d'un worker face à un témoin qui charge son propre
+# modèle, en part de la mémoire prise par le chargement dans le parent
+# (qui compte aussi les arènes de l'allocateur et le cache SQLite : une
+# seconde copie coûte moins, d'où la marge). Sans gc.freeze() l'économie
+# devient négative
+MEMCHECK_MIN_SHARED_RATIO = 0.25
+MEMCHECK_REQUESTS = 200
+
+
+class Supervisor:
+    """
+    Charge le modèle, fork les workers et les surveille
+    """
+
+    def __init__(self, host=server.HOST, port=server.PORT, workers=WORKERS,
+                 window_ms=server.BATCH_WINDOW_MS, max_batch_size=server.MAX_BATCH_SIZE,
+                 freeze=True, share_model=True):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.freeze = freeze
+        self.share_model = share_model   # False : chaque worker recharge (témoin)
+        self.sock = None
+        self.children = {}     # pid -> numéro du worker
+        self.stopping = False
+
+    def start(self):
+        import model_interface
+
+        # Chargement synchrone : aucun thread ne doit exister au moment du fork
+        if not model_interface.model_ready.is_set():
+            model_interface.load_model()
+        if self.freeze:
+            gc.freeze()
+
+        self.sock = socket.create_server((self.host, self.port), reuse_port=False,
+                                         backlog=1024)
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+
+        for number in range(self.workers):
+            self._spawn(number)
+        return self
+
+    def _spawn(self, number):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = number
+            return
+        # Enfant : ne revient jamais
+        code = 0
+        try:
+            self._worker()
+        except KeyboardInterrupt:
+            pass
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _worker(self):
+        import model_interface
+        model_interface.reopen_after_fork()
+        if not self.share_model:
+            # Référence gardée uniquement pour que le modèle hérité reste en
+            # vie : le libérer écrirait dans ses pages, donc les recopierait
+            self._inherited_model = (model_interface.model, model_interface.vectorizer,
+                                     model_interface.fast_scorer)
+            model_interface.load_model(verbose=False)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        async def serve():
+            routing = server.RoutingServer(self.host, self.port, self.window_ms,
+                                           self.max_batch_size)
+            await routing.start(sock=self.sock)
+            try:
+                await routing.server.serve_forever()
+            finally:
+                await routing.stop()
+
+        asyncio.run(serve())
+
+    def run(self):
+        """
+        Boucle du parent : relance les workers morts jusqu'à l'arrêt
+        """
+        def request_stop(signum, frame):
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        while not self.stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.2)
+                continue
+            number = self.children.pop(pid, None)
+            if number is not None and not self.stopping:
+                print(f"⚠️  worker {number} (pid {pid}) arrêté (status {status}), relance")
+                self._spawn(number)
+
+        self.stop()
+
+    def stop(self, timeout=5.0):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + timeout
+        while self.children and time.monotonic() < deadline:
+            for pid in list(self.children):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    self.children.pop(pid, None)
+            time.sleep(0.05)
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self.children.pop(pid, None)
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+# ============================================================================
+# MESURE MÉMOIRE (Linux)
+# ============================================================================
+
+def memory_usage(pid="self"):
+    """
+    RSS / PSS / USS (Mo) d'un process, d'après /proc/<pid>/smaps_rollup
+    USS = pages privées (Private_Clean + Private_Dirty) : ce que le process
+    coûte vraiment ; PSS = USS + sa part des pages partagées
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            parts = value.split()
+            if len(parts) == 2 and parts[1] == "kB":
+                fields[name] = int(parts[0])
+    return {
+        "rss_mb": fields.get("Rss", 0) / 1024,
+        "pss_mb": fields.get("Pss", 0) / 1024,
+        "uss_mb": (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024,
+    }
+
+
+def _memcheck_run(workers, freeze, share_model, requests):
+    """
+    Un lancement du superviseur : fait travailler les workers (tier IA),
+    puis mesure la mémoire du parent et de chaque worker
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    supervisor = Supervisor(port=0, workers=workers, freeze=freeze,
+                            share_model=share_model).start()
+    try:
+        messages = [f"Solve the equation {i}x + 5 = 17 and explain each step"
+                    for i in range(requests)]
+        with ThreadPoolExecutor(max_workers=workers * 4) as pool:
+            decisions = list(pool.map(
+                lambda message: server.route_via_http(message, supervisor.host,
+                                                      supervisor.port),
+                messages))
+
+        parent = memory_usage(os.getpid())
+        usage = {pid: memory_usage(pid) for pid in supervisor.children}
+    finally:
+        supervisor.stop()
+
+    print(f"\n{'partagé' if share_model else 'témoin (un modèle par worker)'} : "
+          f"{len(decisions)} requêtes, tiers : "
+          f"{sorted({decision['tier'] for decision in decisions})}")
+    print(f"{'process':>12}  {'RSS Mo':>8}  {'PSS Mo':>8}  {'USS Mo':>8}")
+    print(f"{'parent':>12}  {parent['rss_mb']:>8.1f}  {parent['pss_mb']:>8.1f}  "
+          f"{parent['uss_mb']:>8.1f}")
+    for pid, row in usage.items():
+        print(f"{pid:>12}  {row['rss_mb']:>8.1f}  {row['pss_mb']:>8.1f}  {row['uss_mb']:>8.1f}")
+    total_pss = parent["pss_mb"] + sum(row["pss_mb"] for row in usage.values())
+    print(f"total PSS : {total_pss:.1f} Mo")
+    return sum(row["uss_mb"] for row in usage.values()) / len(usage)
+
+
+def memcheck(workers=4, freeze=True, requests=MEMCHECK_REQUESTS):
+    """
+    Mesure la mémoire du modèle au chargement, puis l'USS moyenne d'un
+    worker qui partage le modèle et d'un worker témoin qui recharge le sien.
+    True si le partage économise au moins MEMCHECK_MIN_SHARED_RATIO du
+    modèle par worker
+    """
+    import model_interface
+
+    if model_interface.model_ready.is_set():
+        raise RuntimeError("memcheck doit charger le modèle lui-même (process neuf)")
+    # Cache en mémoire seulement : avec le fichier SQLite, le second lancement
+    # relirait les résultats du premier au lieu de faire travailler le modèle
+    model_interface.CACHE_PATH = None
+    # Dépendances importées d'abord : la mesure ne compte que le modèle
+    import joblib                                   # noqa: F401
+    import sklearn.feature_extraction.text          # noqa: F401
+    import sklearn.linear_model                     # noqa: F401
+    before = memory_usage()
+    model_interface.load_model(verbose=False)
+    model_mb = memory_usage()["uss_mb"] - before["uss_mb"]
+
+    shared = _memcheck_run(workers, freeze, True, requests)
+    control = _memcheck_run(workers, freeze, False, requests)
+
+    saved = control - shared
+    minimum = model_mb * MEMCHECK_MIN_SHARED_RATIO
+    ok = model_mb > 0 and saved >= minimum
+    print(f"\nmodèle chargé : {model_mb:.1f} Mo ; USS moyenne d'un worker : "
+          f"{shared:.1f} Mo partagé, {control:.1f} Mo témoin")
+    print(f"économisé par worker : {saved:.1f} Mo "
+          f"({saved / model_mb if model_mb > 0 else 0:.0%} du modèle, "
+          f"minimum {MEMCHECK_MIN_SHARED_RATIO:.0%}) {'✅' if ok else '❌'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur de routage pre-fork")
+    parser.add_argument("--host", default=server.HOST)
+    parser.add_argument("--port", type=int, default=server.PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--batch-window-ms", type=float, default=server.BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch-size", type=int, default=server.MAX_BATCH_SIZE)
+    parser.add_argument("--no-freeze", action="store_true", help="sans gc.freeze()")
+    parser.add_argument("--memcheck", action="store_true",
+                        help="mesure PSS / USS par worker, puis quitte")
+    args = parser.parse_args()
+
+    if args.memcheck:
+        raise SystemExit(0 if memcheck(args.workers, not args.no_freeze) else 1)
+
+    supervisor = Supervisor(args.host, args.port, args.workers, args.batch_window_ms,
+                            args.max_batch_size, not args.no_freeze).start()
+    print(f"🚀 {args.workers} workers sur http://{supervisor.host}:{supervisor.port}")
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
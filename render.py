@@ -0,0 +1,48 @@
+"""
+Affichage rich des résultats du modèle IA (REPL uniquement)
+Les autres chemins (serveur, batch, pipeline JSONL) n'importent pas rich
+"""
+
+from rich.console import Console
+from rich.panel import Panel
+
+import instrumentation
+
+console = Console()
+
+def render_classification(result, top_n=3, console=console):
+    """
+    Affiche la difficulté du prompt avec une couleur + les top prédictions
+    """
+    timed = instrumentation.ENABLED
+    if timed:
+        t = instrumentation.now()
+    
+    prediction = result.prediction
+    difficulty, color, emoji = result.difficulty
+    
+    # Afficher la difficulté avec style
+    console.print(Panel(
+        f"[bold]{emoji} Difficulté: [{color}]{difficulty}[/{color}][/bold]\n"
+        f"Confiance: [bold]{result.confidence:.1%}[/bold] | "
+        f"Entropie: [bold]{result.entropy:.2f}[/bold]",
+        title="📊 Analyse du Prompt",
+        border_style=color,
+        padding=(0, 1)
+    ))
+    
+    # Afficher les top 3 prédictions
+    console.print(f"\n[bold cyan]Top {top_n} prédictions:[/bold cyan]")
+    for i, (category, prob) in enumerate(result.top_k[:top_n], 1):
+        bar_length = int(prob * 20)
+        bar = "█" * bar_length + "░" * (20 - bar_length)
+        marker = "👈" if category == prediction else ""
+        console.print(f"  {i}. {category:30s} [{color}]{bar}[/{color}] {prob:5.1%} {marker}")
+    
+    if result.truncated:
+        console.print("[yellow]⚠️  Prompt très long : seul le début a été analysé[/yellow]")
+    
+    console.print()  # Ligne vide pour l'espacement
+    
+    if timed:
+        instrumentation.lap("rendering", t)
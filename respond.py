@@ -1,6 +1,14 @@
+import json
+import os
 import random
-import readline
-from is_similar import is_similar
+import threading
+import time
+from collections import namedtuple
+import instrumentation
+from fuzzy_phrases import FUZZY_MAX_WORDS, build_fuzzy_index, find_fuzzy_category, split_words
+from is_similar import build_typo_index, lookup_typo_category
+from phrase_index import build_phrase_index, find_phrase_category
+import tokenizer
 
 
 def load_replies_from_file(filename): 
@@ -12,19 +20,22 @@ def load_replies_from_file(filename):
         print(f"Warning: {filename} not found. Using default replies.")
         return ["You're welcome!", "No problem!", "My pleasure!"]
 
-replies_thanks = load_replies_from_file('answer_txt/replies_thanks.txt')
-replies_greeting = load_replies_from_file('answer_txt/replies_greeting.txt')
-replies_goodbye = load_replies_from_file('answer_txt/replies_goodbye.txt')
-replies_how_are_you = load_replies_from_file('answer_txt/replies_how_are_you.txt')
-
-responses = {
-    "reply_thanks": replies_thanks,            
-    "reply_greeting": replies_greeting,      
-    "reply_goodbye": replies_goodbye,        
-    "reply_how_are_you": replies_how_are_you,
+# Fichiers de réponses par catégorie
+REPLY_FILES = {
+    "reply_thanks": 'answer_txt/replies_thanks.txt',
+    "reply_greeting": 'answer_txt/replies_greeting.txt',
+    "reply_goodbye": 'answer_txt/replies_goodbye.txt',
+    "reply_how_are_you": 'answer_txt/replies_how_are_you.txt',
 }
 
-keywords = {
+# Table des keywords (externalisée), l'ordre des catégories = priorité
+KEYWORDS_FILE = 'keywords.json'
+
+# Étape 4 de detect_category : phrases approchées mot à mot (fuzzy_phrases.py)
+FUZZY_PHRASES = True
+
+# Utilisée si keywords.json est absent ou invalide
+DEFAULT_KEYWORDS = {
     "reply_thanks": [
         "thanks",
         "thank",
@@ -57,21 +68,165 @@ keywords = {
     ]
 }
 
+def _default_keywords():
+    # Copie : la table publiée peut être modifiée en place (rebuild_indexes)
+    return {category: list(keyword_list) for category, keyword_list in DEFAULT_KEYWORDS.items()}
+
+def load_keywords_from_file(filename, strict=False):
+    """
+    Table {category: [keyword, ...]} lue dans filename
+    Fichier absent : keywords par défaut. Fichier invalide : keywords par
+    défaut, ou ValueError si strict (rechargement : on garde l'ancienne table)
+    """
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        if not isinstance(table, dict) or not all(
+                isinstance(v, list) and all(isinstance(k, str) for k in v)
+                for v in table.values()):
+            raise ValueError("expected {category: [keyword, ...]}")
+        # Une catégorie sans fichier de réponses ferait planter pick_reply
+        unknown = [category for category in table if category not in REPLY_FILES]
+        if unknown:
+            print(f"Warning: {filename}: no reply file for {', '.join(unknown)}. "
+                  f"Ignoring these categories.")
+            table = {category: keyword_list for category, keyword_list in table.items()
+                     if category in REPLY_FILES}
+        return table
+    except FileNotFoundError:
+        return _default_keywords()
+    except ValueError as error:
+        if strict:
+            raise ValueError(f"{filename} is invalid ({error})") from None
+        print(f"Warning: {filename} is invalid ({error}). Using default keywords.")
+        return _default_keywords()
+
+# ============================================================================
+# DONNÉES + INDEX DÉRIVÉS (snapshot immuable, remplacé d'un bloc)
+# ============================================================================
+# detect_category lit `data` une seule fois par message : un rechargement
+# en cours ne peut jamais lui montrer un état à moitié construit.
+
+RoutingData = namedtuple("RoutingData", ["responses", "keywords", "phrase_index",
+                                         "typo_index", "fuzzy_index", "mtimes"])
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def build_data(previous=None, force=False):
+    """
+    Construit un nouveau snapshot en ne relisant que les fichiers modifiés
+    Retourne (snapshot, liste des fichiers rechargés)
+    ValueError si keywords.json est invalide alors qu'un snapshot existe
+    """
+    paths = list(REPLY_FILES.values()) + [KEYWORDS_FILE]
+    mtimes = {path: _mtime(path) for path in paths}
+    changed = [path for path in paths
+               if force or previous is None or previous.mtimes.get(path) != mtimes[path]]
+    
+    if previous is not None and not changed:
+        return previous, []
+    
+    responses = dict(previous.responses) if previous is not None else {}
+    for category, path in REPLY_FILES.items():
+        if path in changed:
+            responses[category] = load_replies_from_file(path)
+    
+    if KEYWORDS_FILE in changed:
+        keywords = load_keywords_from_file(KEYWORDS_FILE, strict=previous is not None)
+        # Index reconstruits seulement si la table des keywords a changé
+        phrase_index = build_phrase_index(keywords)
+        typo_index = build_typo_index(keywords)
+        fuzzy_index = build_fuzzy_index(keywords)
+    else:
+        keywords = previous.keywords
+        phrase_index, typo_index = previous.phrase_index, previous.typo_index
+        fuzzy_index = previous.fuzzy_index
+    
+    return (RoutingData(responses, keywords, phrase_index, typo_index, fuzzy_index, mtimes),
+            changed)
+
+def _publish(new_data):
+    global data, responses, keywords, phrase_index, typo_index
+    data = new_data
+    # Alias historiques (lecture seule, pour les appelants existants)
+    responses, keywords = data.responses, data.keywords
+    phrase_index, typo_index = data.phrase_index, data.typo_index
+
+_reload_lock = threading.Lock()
+_rejected_mtime = None   # keywords.json invalide déjà signalé (une fois par version)
+
+def reload_data(force=False):
+    """
+    Recharge les fichiers modifiés et publie le nouveau snapshot
+    Retourne la liste des fichiers rechargés (vide si rien n'a changé)
+    keywords.json invalide (ou en cours d'écriture) : avertissement, et le
+    snapshot courant reste publié
+    """
+    global _rejected_mtime
+    with _reload_lock:
+        try:
+            new_data, changed = build_data(data, force)
+        except ValueError as error:
+            mtime = _mtime(KEYWORDS_FILE)
+            if mtime != _rejected_mtime:
+                print(f"Warning: {error}. Keeping the current keywords.")
+                _rejected_mtime = mtime
+            return []
+        if changed:
+            _publish(new_data)
+        return changed
+
+def rebuild_indexes():
+    """
+    Reconstruit les index dérivés de `keywords`
+    A appeler après toute modification en place de la table des keywords
+    """
+    with _reload_lock:
+        _publish(data._replace(keywords=keywords,
+                               phrase_index=build_phrase_index(keywords),
+                               typo_index=build_typo_index(keywords),
+                               fuzzy_index=build_fuzzy_index(keywords)))
+
+_watcher = None
+
+def start_watcher(interval=1.0):
+    """
+    Surveille les fichiers (mtime) dans un thread : les rechargements et la
+    reconstruction des index se font hors du chemin des requêtes
+    """
+    global _watcher
+    if _watcher is not None:
+        return _watcher
+    
+    def watch():
+        while True:
+            time.sleep(interval)
+            try:
+                reload_data()
+            except Exception as error:
+                print(f"Warning: reload failed ({error})")
+    
+    _watcher = threading.Thread(target=watch, name="data-watcher", daemon=True)
+    _watcher.start()
+    return _watcher
+
+data = None
+_publish(build_data()[0])
+
 def normalize_message(message):
     """
-    Remplace les abréviations courantes
+    Remplace les abréviations courantes ("u" -> "you", "r" -> "are")
+    Un seul passage regex, voir tokenizer.py
     """
-    message = message.lower()
-    # Remplacer les abréviations
-    message = message.replace(" u ", " you ")
-    message = message.replace(" r ", " are ")
-    message = message.replace("u ", "you ")
-    message = message.replace(" u?", " you?")
-    return message
+    return tokenizer.normalize_message(message)
 
 def is_valid_message(message):
     
-    message = message.strip()
+    message = tokenizer.raw_text(message).strip()
     
     if len(message) == 0:
         return False
@@ -88,58 +243,114 @@ def is_valid_message(message):
     
     return True
 
-def detect_category(message):
+def detect_category(message, with_reply=False):
     """
     Détecte la catégorie du message
     Utilise le système de détection de typos avancé
+    message : str ou tokenizer.Text déjà analysé (pas de re-normalisation)
+    with_reply : retourne (catégorie, réponse), tirées du même snapshot
+    (un rechargement entre les deux ne peut pas retirer la catégorie)
+    """
+    # Un seul snapshot pour tout le message (voir reload_data)
+    current = data
+    category = _detect_category(current, message)
+    if not with_reply:
+        return category
+    return category, (pick_reply(category, current) if category else None)
+
+def _detect_category(current, message):
+    """
+    detect_category sur un snapshot donné
     """
-    message = normalize_message(message)
-    message = message.strip()
+    # Chronométrage par étape (instrumentation.py), gratuit si désactivé
+    timed = instrumentation.ENABLED
+    if timed:
+        t = instrumentation.now()
+    
+    text = tokenizer.analyze(message)
+    
+    # Si le message est trop long, rediriger vers l'IA : > 5 mots, ou
+    # > FUZZY_MAX_WORDS avec les phrases approchées (étape 4)
+    # (les abréviations ne changent pas le nombre de mots : inutile de
+    # normaliser un long message)
+    if len(text.words) > (FUZZY_MAX_WORDS if FUZZY_PHRASES else 5):
+        return None
+    
+    message = tokenizer.expand_abbreviations(text.lower).strip()
     message_words = message.split()
     
+    if timed:
+        t = instrumentation.lap("normalization", t)
+    
     # VÉRIFICATION LONGUEUR DÉPLACÉE ICI (après normalisation)
     # Si le message est trop court (≤ 2 caractères) et n'est pas dans les exceptions
     if len(message) <= 2 and message not in ["?", "!!", "hi", "yo", "ok", "ty"]:
         return None
     
-    # Si le message est trop long (> 5 mots), rediriger vers l'IA
-    if len(message_words) > 5:
-        return None
-    
     # ÉTAPE 1 : Chercher des PHRASES complètes (pour "how are you", etc.)
-    for category, keyword_list in keywords.items():
-        for keyword in keyword_list:
-            # Si le keyword contient un espace, c'est une phrase
-            if " " in keyword:
-                if keyword in message:
-                    return category
+    # Toutes les phrases en un seul passage (automate, phrase_index.py)
+    # (seulement jusqu'à 5 mots, comme avant l'étape 4)
+    if len(text.words) <= 5:
+        found = find_phrase_category(current.phrase_index, message)
+    else:
+        found = None
+    
+    if timed:
+        t = instrumentation.lap("phrase_match", t)
+    if found:
+        return found
     
     # ÉTAPE 2 : Correspondance exacte MOT PAR MOT
-    for category, keyword_list in keywords.items():
-        for keyword in keyword_list:
-            # Seulement les keywords d'un seul mot
-            if " " not in keyword:
-                for word in message_words:
-                    if word == keyword:
-                        if len(message_words) <= 2:
-                            return category
+    if len(message_words) <= 2:
+        for category, keyword_list in current.keywords.items():
+            for keyword in keyword_list:
+                # Seulement les keywords d'un seul mot
+                if " " not in keyword and keyword in message_words:
+                    found = category
+                    break
+            if found:
+                break
+    
+    if timed:
+        t = instrumentation.lap("exact_match", t)
+    if found:
+        return found
     
     # ÉTAPE 3 : Détection de TYPOS avec le super algorithme
     # Seulement pour messages courts (2 mots max)
+    # L'index donne directement la catégorie la plus prioritaire par mot
     if len(message_words) <= 2:
-        for category, keyword_list in keywords.items():
-            for keyword in keyword_list:
-                # Seulement keywords simples (pas de phrases)
-                if " " not in keyword:
-                    for word in message_words:
-                        # UTILISE LE SUPER ALGORITHME ICI
-                        if is_similar(word, keyword):
-                            return category
+        best = None
+        for word in message_words:
+            match = lookup_typo_category(current.typo_index, word)
+            if match is not None and (best is None or match[0] < best[0]):
+                best = match
+        if best is not None:
+            found = best[1]
+    
+    if timed:
+        t = instrumentation.lap("typo_match", t)
+    if found or not FUZZY_PHRASES:
+        return found
+    
+    # ÉTAPE 4 : Phrases approchées mot à mot ("how ar yuo doing") et
+    # keywords entourés de mots de remplissage ("thnks a lot my friend")
+    found = find_fuzzy_category(current.fuzzy_index, split_words(message),
+                                current.typo_index)
     
-    return None
+    if timed:
+        instrumentation.lap("fuzzy_match", t)
+    return found
+
+def pick_reply(category, current=None):
+    """
+    Choisit une réponse au hasard pour une catégorie déjà détectée
+    current : snapshot où la catégorie a été détectée (par défaut le dernier)
+    """
+    return random.choice((current or data).responses[category])
 
 def respond(message):
-    category = detect_category(message)
+    category, reply = detect_category(message, with_reply=True)
     if category:
-        return random.choice(responses[category])
+        return reply
     return "You will be redirected shortly..."
\ No newline at end of file
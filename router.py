@@ -0,0 +1,248 @@
+"""
+Pipeline de routage commun (REPL, serveur HTTP, outils batch)
+=============================================================
+1. respond.is_valid_message
+2. respond.detect_category  -> réponse frugale, sans modèle
+3. sinon model_interface.classify_batch (un seul passage pour le lot)
+
+Chaque décision est un dict sérialisable en JSON :
+    {"tier": "invalid" | "frugal" | "ai", ...}
+"""
+
+import json
+import queue
+import threading
+import time
+
+import instrumentation
+import respond
+import tokenizer
+
+# Mode pipeline : taille max d'un lot pour le modèle IA, nombre max de
+# décisions retenues en attendant ce lot (ordre de sortie = ordre d'entrée)
+# et âge max (ms) du plus ancien message IA en attente, entrée inactive ou non
+STREAM_BATCH_SIZE = 64
+STREAM_MAX_BUFFER = 1024
+STREAM_MAX_AGE_MS = 50
+
+# Au-delà (en caractères), detect_category n'est même pas appelé : aucune
+# formule de politesse n'est aussi longue, et le coût reste borné
+FRUGAL_MAX_CHARS = 200
+
+
+def route_frugal(message, timings=None):
+    """
+    Décision du tier frugal, ou None si le message doit aller au modèle IA
+    message : str ou tokenizer.Text (analysé une fois, réutilisé par le tier IA)
+    timings (dict optionnel) reçoit la durée de chaque étape en ms
+    """
+    start = time.perf_counter()
+    # Borné à tokenizer.MAX_INPUT_CHARS avant tout lower / split
+    message = tokenizer.analyze(message)
+    valid = respond.is_valid_message(message)
+    validated = time.perf_counter()
+    if timings is not None:
+        timings["validation"] = (validated - start) * 1000
+    if instrumentation.ENABLED:
+        instrumentation.record("validation", (validated - start) * 1e9)
+    if not valid:
+        count_tier("invalid")
+        return {"tier": "invalid", "category": None, "reply": None}
+
+    if len(message.raw) > FRUGAL_MAX_CHARS:
+        category = reply = None
+    else:
+        # Catégorie et réponse du même snapshot (rechargement concurrent)
+        category, reply = respond.detect_category(message, with_reply=True)
+    if timings is not None:
+        timings["detect_category"] = (time.perf_counter() - validated) * 1000
+    if category:
+        count_tier("frugal")
+        return {
+            "tier": "frugal",
+            "category": category,
+            "reply": reply,
+        }
+    count_tier("ai")
+    return None
+
+
+def count_tier(tier):
+    if instrumentation.ENABLED:
+        instrumentation.count("tier." + tier)
+
+
+def ai_decision(result):
+    """
+    Convertit une Classification du modèle en décision JSON
+    """
+    level, _, emoji = result.difficulty
+    return {
+        "tier": "ai",
+        "category": None,
+        "prediction": result.prediction,
+        "confidence": result.confidence,
+        "entropy": result.entropy,
+        "difficulty": level,
+        "difficulty_emoji": emoji,
+        "top_k": [[category, proba] for category, proba in result.top_k],
+        "truncated": result.truncated,
+    }
+
+
+def route_messages(messages):
+    """
+    Route une liste de messages ; ceux qui ont besoin du modèle sont
+    classifiés ensemble en un seul appel. Décisions dans l'ordre d'entrée.
+    """
+    # Analyse unique, partagée par les deux tiers
+    messages = [tokenizer.analyze(message) for message in messages]
+    decisions = []
+    pending = []
+    for i, message in enumerate(messages):
+        decision = route_frugal(message)
+        decisions.append(decision)
+        if decision is None:
+            pending.append(i)
+
+    if pending:
+        from model_interface import classify_batch
+        results = classify_batch([messages[i] for i in pending])
+        for i, result in zip(pending, results):
+            decisions[i] = ai_decision(result)
+
+    return decisions
+
+
+def route_message(message):
+    return route_messages([message])[0]
+
+
+# ============================================================================
+# MODE PIPELINE (JSONL)
+# ============================================================================
+
+def parse_record(line):
+    """
+    Une ligne JSONL -> (id, message)
+    Accepte {"message": "...", "id": ...} ou une simple chaîne JSON
+    """
+    record = json.loads(line)
+    if isinstance(record, str):
+        return None, record
+    if isinstance(record, dict) and isinstance(record.get("message"), str):
+        return record.get("id"), record["message"]
+    raise ValueError("expected a JSON string or an object with a 'message' string")
+
+
+_END_OF_LINES = object()
+
+
+def _read_ahead(lines, size=STREAM_MAX_BUFFER):
+    """
+    Lit lines dans un thread : l'appelant peut attendre la ligne suivante
+    avec un délai. File de (ligne, None), (None, exception) puis _END_OF_LINES
+    """
+    lines_queue = queue.Queue(maxsize=size)
+
+    def read():
+        try:
+            for line in lines:
+                lines_queue.put((line, None))
+        except Exception as error:
+            lines_queue.put((None, error))
+        lines_queue.put(_END_OF_LINES)
+
+    threading.Thread(target=read, name="stream-reader", daemon=True).start()
+    return lines_queue
+
+
+def route_stream_groups(lines, batch_size=STREAM_BATCH_SIZE, max_buffer=STREAM_MAX_BUFFER,
+                        max_age_ms=STREAM_MAX_AGE_MS):
+    """
+    Générateur : lignes JSONL en entrée -> groupes de décisions (listes de
+    dicts) prêts à écrire, dans l'ordre d'entrée
+    
+    Les réponses frugales sortent tout de suite, sauf si un message IA plus
+    ancien attend son lot : on garde alors l'ordre d'entrée. Un lot part dès
+    batch_size messages IA, max_buffer décisions en attente, max_age_ms
+    depuis le plus ancien message IA (même sans nouvelle ligne), ou en fin
+    de flux.
+    """
+    buffer = []     # décisions dans l'ordre d'entrée
+    pending = []    # (décision, message) qui attendent le modèle
+    max_age = max_age_ms / 1000
+    oldest = None   # arrivée du plus ancien message de pending
+
+    def flush():
+        if pending:
+            from model_interface import classify_batch
+            start = time.perf_counter()
+            results = classify_batch([message for _, message in pending])
+            elapsed = (time.perf_counter() - start) * 1000
+            for (decision, _), result in zip(pending, results):
+                record_id, timing = decision["id"], decision["timing_ms"]
+                # Durée du lot entier, partagée par ses batch_size messages
+                timing["classify_batch"] = elapsed
+                timing["total"] += elapsed
+                # Mise à jour en place : la décision est déjà dans buffer
+                decision.clear()
+                decision.update({"id": record_id, **ai_decision(result),
+                                 "batch_size": len(pending), "timing_ms": timing})
+            pending.clear()
+        group = list(buffer)
+        buffer.clear()
+        return group
+
+    lines_queue = _read_ahead(lines)
+    while True:
+        timeout = None
+        if pending:
+            timeout = max(0.0, oldest + max_age - time.perf_counter())
+        try:
+            item = lines_queue.get(timeout=timeout)
+        except queue.Empty:
+            # Entrée inactive : le lot en attente part sans attendre
+            yield flush()
+            continue
+        if item is _END_OF_LINES:
+            break
+        line, error = item
+        if error is not None:
+            raise error
+        if not line.strip():
+            continue
+        start = time.perf_counter()
+        timings = {}
+        try:
+            record_id, message = parse_record(line)
+        except ValueError as error:
+            decision = {"id": None, "tier": "error", "error": str(error)}
+        else:
+            message = tokenizer.analyze(message)
+            frugal = route_frugal(message, timings)
+            decision = {"id": record_id, **(frugal or {"tier": "ai"})}
+            if frugal is None:
+                if not pending:
+                    oldest = start
+                pending.append((decision, message))
+        timings["total"] = (time.perf_counter() - start) * 1000
+        decision["timing_ms"] = timings
+
+        buffer.append(decision)
+        if (not pending or len(pending) >= batch_size or len(buffer) >= max_buffer
+                or time.perf_counter() - oldest >= max_age):
+            yield flush()
+
+    if buffer:
+        yield flush()
+
+
+def route_stream(lines, batch_size=STREAM_BATCH_SIZE, max_buffer=STREAM_MAX_BUFFER,
+                 max_age_ms=STREAM_MAX_AGE_MS):
+    """
+    Générateur : une ligne JSONL en entrée -> une décision (dict) en sortie
+    (voir route_stream_groups)
+    """
+    for group in route_stream_groups(lines, batch_size, max_buffer, max_age_ms):
+        yield from group
@@ -0,0 +1,364 @@
+"""
+Serveur HTTP/JSON asyncio
+=========================
+Même pipeline que main.py (router.py), mais pour plusieurs clients :
+- tier frugal (validation + detect_category) : réponse immédiate
+- tier IA : les messages sont regroupés pendant une courte fenêtre
+  (ou jusqu'à une taille max) puis classifiés en un seul appel vectorisé
+
+Endpoints :
+    POST /route    {"message": "..."}  -> décision JSON
+    GET  /health   -> {"status": "ok", "model_ready": bool}
+    GET  /stats    -> compteurs du micro-batching et des quasi-doublons
+
+Usage :
+    python server.py --port 8000 --batch-window-ms 5 --max-batch-size 64
+    python server.py --selftest      # serveur + client en local (loopback)
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import router
+import tokenizer
+
+HOST = "127.0.0.1"
+PORT = 8000
+
+# Micro-batching du tier IA
+BATCH_WINDOW_MS = 5
+MAX_BATCH_SIZE = 64
+
+MAX_BODY_BYTES = 1 << 20
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+# ============================================================================
+# MICRO-BATCHING
+# ============================================================================
+
+class MicroBatcher:
+    """
+    Regroupe les messages du tier IA et les classifie par lots
+    Un lot part après window_ms (à partir du premier message) ou dès
+    qu'il atteint max_batch_size
+    """
+
+    def __init__(self, window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE):
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.queue = None
+        self.task = None
+        # Thread dédié au modèle : jamais bloqué par d'autres tâches
+        self.executor = None
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0, "errors": 0}
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="classifier")
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def classify(self, message):
+        future = asyncio.get_running_loop().create_future()
+        self.stats["requests"] += 1
+        await self.queue.put((message, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.window
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            getter = loop.create_task(self.queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=remaining)
+            if getter in done:
+                batch.append(getter.result())
+            else:
+                # Annulé avant d'avoir pris un élément : rien n'est perdu
+                getter.cancel()
+                break
+
+        return batch
+
+    async def _run(self):
+        from model_interface import classify_batch
+
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            messages = [message for message, _ in batch]
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+            try:
+                # Le modèle tourne hors de la boucle asyncio
+                results = await loop.run_in_executor(self.executor, classify_batch, messages)
+            except Exception as error:
+                self.stats["errors"] += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+class RoutingServer:
+    """
+    Petit serveur HTTP/1.1 (keep-alive) au-dessus d'asyncio.start_server
+    """
+
+    def __init__(self, host=HOST, port=PORT, window_ms=BATCH_WINDOW_MS,
+                 max_batch_size=MAX_BATCH_SIZE):
+        self.host = host
+        self.port = port
+        self.batcher = MicroBatcher(window_ms, max_batch_size)
+        self.server = None
+        self.tiers = {"invalid": 0, "frugal": 0, "ai": 0}
+
+    async def start(self, sock=None):
+        """
+        sock : socket déjà en écoute (partagé entre workers, voir prefork.py)
+        """
+        import model_interface
+        model_interface.warm_up()
+        # Réponses / keywords rechargés à chaud quand les fichiers changent
+        router.respond.start_watcher()
+
+        self.batcher.start()
+        if sock is not None:
+            self.server = await asyncio.start_server(self.handle, sock=sock)
+        else:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        # Port réel (utile avec port=0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def route(self, message):
+        start = time.perf_counter()
+        message = tokenizer.analyze(message)
+        decision = router.route_frugal(message)
+        if decision is None:
+            result = await self.batcher.classify(message)
+            decision = router.ai_decision(result)
+        decision["latency_ms"] = (time.perf_counter() - start) * 1000
+        self.tiers[decision["tier"]] += 1
+        return decision
+
+    async def dispatch(self, method, path, body):
+        if path == "/route":
+            if method != "POST":
+                return 405, {"error": "POST only"}
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                return 400, {"error": "invalid JSON"}
+            message = payload.get("message") if isinstance(payload, dict) else None
+            if not isinstance(message, str):
+                return 400, {"error": "'message' (string) is required"}
+            return 200, await self.route(message)
+
+        if path == "/health":
+            import model_interface
+            return 200, {"status": "ok", "model_ready": model_interface.model_ready.is_set()}
+
+        if path == "/stats":
+            import model_interface
+            index = model_interface.near_duplicates
+            return 200, {"tiers": self.tiers, "batching": self.batcher.stats,
+                         "near_duplicates": index.stats() if index is not None else None}
+
+        return 404, {"error": f"unknown path {path}"}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.send(writer, 400, {"error": "bad request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self.send(writer, 400, {"error": "invalid Content-Length"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self.send(writer, 413, {"error": "body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = await self.dispatch(method, path.split("?")[0], body)
+                except Exception as error:
+                    status, payload = 500, {"error": str(error)}
+
+                await self.send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def send(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n"
+        )
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+
+# ============================================================================
+# CLIENT LOOPBACK
+# ============================================================================
+
+def request_json(host, port, method, path, payload=None, timeout=30):
+    """
+    Client HTTP minimal (bloquant) : retourne (status, json)
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        connection.close()
+
+
+def route_via_http(message, host=HOST, port=PORT):
+    return request_json(host, port, "POST", "/route", {"message": message})[1]
+
+
+async def selftest(clients=32):
+    """
+    Lance le serveur sur un port libre et l'interroge en loopback
+    Vérifie les décisions contre router.route_message et le micro-batching
+    """
+    server = await RoutingServer(port=0, window_ms=20).start()
+    loop = asyncio.get_running_loop()
+    messages = ["hello", "thnks", "", "how are you",
+                "Write a short poem about autumn leaves",
+                "Solve the equation 2x + 5 = 17 and explain each step"]
+    try:
+        import model_interface
+        await loop.run_in_executor(None, model_interface.ensure_model_loaded)
+
+        calls = [loop.run_in_executor(None, route_via_http, messages[i % len(messages)],
+                                      server.host, server.port)
+                 for i in range(clients)]
+        decisions = await asyncio.gather(*calls)
+        stats = await loop.run_in_executor(None, request_json, server.host,
+                                           server.port, "GET", "/stats")
+    finally:
+        await server.stop()
+
+    failures = 0
+    for i, decision in enumerate(decisions):
+        expected = router.route_message(messages[i % len(messages)])
+        same = decision["tier"] == expected["tier"] and (
+            decision.get("category") == expected.get("category")
+            and decision.get("prediction") == expected.get("prediction"))
+        failures += not same
+
+    print(f"{len(decisions)} requêtes, {failures} écart(s)")
+    print(f"stats : {stats[1]}")
+    return failures == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frugal AI routing server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--selftest", action="store_true",
+                        help="serveur + client loopback, puis quitte")
+    args = parser.parse_args()
+
+    if args.selftest:
+        raise SystemExit(0 if asyncio.run(selftest()) else 1)
+
+    async def serve():
+        server = await RoutingServer(args.host, args.port, args.batch_window_ms,
+                                     args.max_batch_size).start()
+        print(f"🚀 Serveur sur http://{server.host}:{server.port}")
+        try:
+            await server.server.serve_forever()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
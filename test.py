@@ -4,7 +4,6 @@
 # In[9]:
 
 
-import joblib
 import numpy as np
 
 # Monter Drive
@@ -13,8 +12,11 @@ import numpy as np
 print("📥 Chargement du modèle...")
 
 SAVE_PATH = ""
-model = joblib.load(SAVE_PATH + 'exercise_classifier_balanced.pkl')
-vectorizer = joblib.load(SAVE_PATH + 'tfidf_vectorizer_balanced.pkl')
+# Artefact mmap (model_artifact.py) si à jour, sinon les .pkl
+from model_artifact import load_model_files
+model, vectorizer, _ = load_model_files(SAVE_PATH + 'exercise_classifier_balanced.pkl',
+                                        SAVE_PATH + 'tfidf_vectorizer_balanced.pkl',
+                                        SAVE_PATH + 'model_artifact')
 
 print(f"✅ Modèle chargé : {len(model.classes_)} classes")
 
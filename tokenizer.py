@@ -0,0 +1,171 @@
+"""
+Normalisation + tokenisation en un seul passage
+===============================================
+Un message est analysé une seule fois par requête (analyze) ; le tier
+frugal (detect_category) et le tier IA (fast_scorer) réutilisent le même
+résultat au lieu de refaire lower / replace / split chacun de leur côté.
+
+    text = analyze("How r u?")
+    text.lower   -> "how r u?"
+    text.words   -> ["how", "r", "u?"]
+    expand_abbreviations(text.lower) -> "how are you?"
+
+Développer une abréviation ne change jamais le nombre de mots : le tier
+frugal peut donc écarter un message long sur text.words, sans le normaliser.
+
+Un message géant n'est jamais analysé en entier : analyze n'en garde que
+le début (MAX_INPUT_CHARS / MAX_INPUT_TOKENS) et marque text.truncated.
+Tous les points d'entrée (REPL, router, pipeline JSONL, serveur HTTP)
+passent par analyze : temps et mémoire par requête sont bornés.
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+
+# Abréviations remplacées quand elles forment un mot à elles seules
+ABBREVIATIONS = {
+    "u": "you",
+    "r": "are",
+}
+
+# Un seul regex pour toutes les abréviations (d'une lettre) : ni précédées
+# ni suivies d'une lettre / d'un chiffre / d'une apostrophe ("u?", "r u",
+# mais pas "menu"). La lettre d'abord, puis le contexte : bien plus rapide
+# qu'un lookbehind en tête de motif sur les longs messages.
+_LETTERS = "".join(ABBREVIATIONS)
+_ABBREVIATION_RE = re.compile(
+    rf"[{_LETTERS}](?![\w'])(?<![\w'][{_LETTERS}])"
+)
+
+# Bornes d'un message : au-delà, seul le début est analysé (None = pas de limite)
+MAX_INPUT_CHARS = 20000
+MAX_INPUT_TOKENS = 4000
+
+Text = namedtuple("Text", ["raw", "lower", "words", "truncated"], defaults=(False,))
+
+
+def _expand(match):
+    return ABBREVIATIONS[match.group()]
+
+
+def expand_abbreviations(lower):
+    """
+    Développe les abréviations d'un texte déjà en minuscules
+    """
+    return _ABBREVIATION_RE.sub(_expand, lower)
+
+
+def normalize_message(message):
+    """
+    Minuscules + abréviations développées (un seul passage regex)
+    """
+    return expand_abbreviations(message.lower())
+
+
+def analyze(message):
+    """
+    Analyse un message une fois pour toutes (un Text est retourné tel quel)
+    Seul le début d'un message trop long est gardé (text.truncated)
+    """
+    if isinstance(message, Text):
+        return message
+    message, truncated = truncate(message, MAX_INPUT_CHARS)
+    lower = message.lower()
+    words = lower.split()
+    if MAX_INPUT_TOKENS is not None and len(words) > MAX_INPUT_TOKENS:
+        # Mêmes tokens et n-grammes pour le vectorizer qu'avec les espaces d'origine
+        message = " ".join(message.split()[:MAX_INPUT_TOKENS])
+        lower = message.lower()
+        words = words[:MAX_INPUT_TOKENS]
+        truncated = True
+    return Text(message, lower, words, truncated)
+
+
+def raw_text(message):
+    return message.raw if isinstance(message, Text) else message
+
+
+def truncate(message, max_chars=None, max_tokens=None):
+    """
+    Début d'un message, borné à max_chars caractères et max_tokens mots
+    (coupé entre deux mots). Retourne (message, tronqué ?) ; un Text
+    tronqué est ré-analysé (truncated=True). Coût en O(max_chars), pas en
+    O(len(message)).
+    """
+    raw = raw_text(message)
+    text = raw
+    if max_chars is not None and len(text) > max_chars:
+        text = text[:max_chars + 1]
+        if not text[-1].isspace():
+            # Le dernier mot est coupé : on le retire (sauf s'il est seul)
+            parts = text.rsplit(None, 1)
+            text = parts[0] if len(parts) > 1 else text[:max_chars]
+    if max_tokens is not None:
+        words = text.split(None, max_tokens)
+        if len(words) > max_tokens:
+            # Mêmes tokens et n-grammes pour le vectorizer qu'avec les espaces d'origine
+            text = " ".join(words[:max_tokens])
+    if text is raw:
+        return message, False
+    if isinstance(message, Text):
+        return analyze(text)._replace(truncated=True), True
+    return text, True
+
+
+# ============================================================================
+# TOKENS DU CLASSIFIEUR
+# ============================================================================
+
+def _strip_accents_unicode(text):
+    # Même résultat que sklearn.feature_extraction.text.strip_accents_unicode
+    if text.isascii():
+        return text
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in normalized if not unicodedata.combining(c))
+
+
+def feature_analyzer(vectorizer):
+    """
+    Fonction Text -> tokens, identique à vectorizer.build_analyzer()(raw)
+    mais qui part de Text.lower (déjà calculé par le tier frugal)
+
+    Pour une configuration non standard (analyzer, preprocessor ou
+    tokenizer personnalisés), on garde l'analyzer du vectorizer.
+    """
+    analyzer = vectorizer.build_analyzer()
+    standard = (
+        vectorizer.analyzer == "word"
+        and vectorizer.input == "content"
+        and vectorizer.lowercase
+        and vectorizer.preprocessor is None
+        and vectorizer.tokenizer is None
+        and vectorizer.strip_accents in (None, "unicode")
+    )
+    if not standard:
+        return lambda message: analyzer(raw_text(message))
+
+    pattern = re.compile(vectorizer.token_pattern)
+    strip_accents = vectorizer.strip_accents == "unicode"
+    stop_words = vectorizer.get_stop_words()
+    min_n, max_n = vectorizer.ngram_range
+
+    def analyze_features(message):
+        text = analyze(message).lower
+        if strip_accents:
+            text = _strip_accents_unicode(text)
+        tokens = pattern.findall(text)
+        if stop_words:
+            tokens = [token for token in tokens if token not in stop_words]
+        if max_n == 1:
+            return tokens
+
+        # n-grammes dans le même ordre que sklearn (_word_ngrams)
+        grams = list(tokens) if min_n == 1 else []
+        count = len(tokens)
+        for n in range(max(min_n, 2), min(max_n, count) + 1):
+            for i in range(count - n + 1):
+                grams.append(" ".join(tokens[i:i + n]))
+        return grams
+
+    return analyze_features
@@ -0,0 +1,378 @@
+"""
+Entraînement reproductible du classifieur d'exercices
+=====================================================
+Reconstruit exercise_classifier_balanced.pkl et tfidf_vectorizer_balanced.pkl
+à partir d'un corpus étiqueté (JSONL {"text", "label"} ou CSV text,label) :
+
+1. TF-IDF calculé une seule fois : la matrice creuse, les étiquettes et le
+   vectorizer sont mis en cache sur disque (clé = contenu du corpus +
+   paramètres du vectorizer + partie) ; un nouvel entraînement sur le même
+   corpus repart directement des matrices
+2. Recherche de C en validation croisée, en parallèle sur n_jobs cœurs
+   (classes toujours équilibrées : class_weight="balanced"), sur la part
+   d'entraînement, avec un vectorizer ajusté sur elle seule
+3. Score sur la part gardée de côté (vocabulaire et IDF sans elle : pas de
+   fuite), puis modèle final et vectorizer sur tout le corpus, écriture des
+   .pkl et d'un manifeste (empreintes, classes, paramètres, durées)
+
+Les plis de la validation croisée partagent le vocabulaire de la part
+d'entraînement : cv_f1_macro est un peu optimiste, pas la précision hold-out.
+
+model_interface vérifie le manifeste au chargement (check_manifest) : des
+.pkl remplacés à la main ou des classes différentes sont refusés.
+
+Usage :
+    python train.py corpus.jsonl                       # -> model_trained/
+    python train.py corpus.jsonl --output . --n-jobs 8
+    python train.py --synthetic corpus.jsonl           # corpus de test hors ligne
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+from ai_cache import files_fingerprint
+
+MODEL_FILE = 'exercise_classifier_balanced.pkl'
+VECTORIZER_FILE = 'tfidf_vectorizer_balanced.pkl'
+MANIFEST_FILE = 'model_manifest.json'
+MANIFEST_FORMAT = 1
+
+OUTPUT_DIR = 'model_trained'
+FEATURE_CACHE_DIR = 'train_cache'
+
+# Paramètres du vectorizer livré
+VECTORIZER_PARAMS = {
+    "ngram_range": (1, 2),
+    "max_features": 5000,
+    "min_df": 5,
+    "max_df": 0.85,
+    "strip_accents": "unicode",
+}
+MODEL_PARAMS = {"solver": "lbfgs", "max_iter": 500, "random_state": 42,
+                "class_weight": "balanced"}
+PARAM_GRID = {
+    "C": [0.3, 1.0, 3.0, 10.0],
+}
+CV_FOLDS = 5
+HOLDOUT_RATIO = 0.2
+N_JOBS = -1
+SEED = 42
+
+
+# ============================================================================
+# CORPUS
+# ============================================================================
+
+def read_corpus(path):
+    """
+    (textes, étiquettes) d'un corpus JSONL {"text", "label"} ou CSV text,label
+    """
+    texts, labels = [], []
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = ((row["text"], row["label"]) for row in csv.DictReader(f))
+        else:
+            rows = ((record["text"], record["label"])
+                    for record in map(json.loads, filter(str.strip, f)))
+        for text, label in rows:
+            texts.append(text)
+            labels.append(str(label))
+    if not texts:
+        raise ValueError(f"Corpus vide : {path}")
+    return texts, labels
+
+
+# Gabarits du corpus synthétique, un jeu par catégorie du modèle livré
+SYNTHETIC_TEMPLATES = {
+    "constrained writing": [
+        "Write a {thing} of exactly {n} words without the letter {letter}",
+        "Compose a {thing} where every line starts with the letter {letter}",
+        "Write a {thing} in exactly {n} sentences, each one shorter than the last",
+    ],
+    "cooking": [
+        "Give me a recipe for {dish} with {ingredient}",
+        "How long should I cook {dish} in the oven",
+        "What can I cook tonight with {ingredient} and rice",
+    ],
+    "creative writing": [
+        "Imagine a story about a {character} who finds a {object}",
+        "Write a {thing} about a {character} lost in the city",
+        "Create a dialogue between a {character} and a talking {object}",
+    ],
+    "editing": [
+        "Rewrite this paragraph to make it more {quality}",
+        "Fix the grammar and spelling in my {document}",
+        "Make this {document} shorter and more {quality}",
+    ],
+    "math exercise": [
+        "Solve {n}x + {m} = {k} for x and explain each step",
+        "Compute the derivative of x^{n} + {m}x",
+        "Find the integral of {n}x^2 from 0 to {m}",
+    ],
+    "math mcq": [
+        "What is {n} times {m}? A) {k} B) {n} C) {m}",
+        "Which value solves {n}x = {k}? A) {m} B) {n} C) {k}",
+        "How much is {k} minus {n}? A) {m} B) {k} C) {n}",
+    ],
+    "mcq": [
+        "What is the capital of {country}? A) {city} B) Rome C) Madrid",
+        "Who wrote this {document}? A) an author B) a {character} C) nobody",
+        "Which {object} is the largest? A) the first B) the second C) the third",
+    ],
+    "memorization": [
+        "Learn these {n} words by heart",
+        "Help me memorize the list of {object}s for my exam",
+        "Quiz me until I remember the {n} capitals of {country}",
+    ],
+    "rag": [
+        "Using the {document} below, answer the question about the {object}",
+        "According to the attached {document}, what happened to the {character}",
+        "Based on the context passage, summarize the {document} and cite the source",
+    ],
+}
+SYNTHETIC_SLOTS = {
+    "thing": ["poem", "story", "haiku", "letter", "song"],
+    "letter": list("aeiost"),
+    "dish": ["pancakes", "lasagna", "soup", "curry", "bread"],
+    "ingredient": ["eggs", "tomatoes", "chicken", "lentils", "cheese"],
+    "character": ["dragon", "detective", "robot", "child", "pirate"],
+    "object": ["key", "map", "planet", "river", "clock"],
+    "quality": ["concise", "formal", "clear", "friendly"],
+    "document": ["essay", "report", "article", "email", "treaty"],
+    "country": ["France", "Spain", "Japan", "Brazil", "Canada"],
+    "city": ["Paris", "Tokyo", "Lima", "Oslo", "Cairo"],
+}
+
+
+def synthetic_corpus(path, per_class=80, seed=SEED):
+    """
+    Écrit un petit corpus JSONL reproductible (per_class exemples par
+    catégorie), pour tester le pipeline sans les données d'origine
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for label, templates in SYNTHETIC_TEMPLATES.items():
+            for _ in range(per_class):
+                slots = {name: rng.choice(values) for name, values in SYNTHETIC_SLOTS.items()}
+                slots.update(n=rng.randint(2, 20), m=rng.randint(2, 20), k=rng.randint(2, 99))
+                text = rng.choice(templates).format(**slots)
+                f.write(json.dumps({"text": text, "label": label}) + "\n")
+    return len(SYNTHETIC_TEMPLATES) * per_class
+
+
+# ============================================================================
+# TF-IDF EN CACHE
+# ============================================================================
+
+def _feature_key(corpus_path, vectorizer_params, part):
+    digest = hashlib.sha256()
+    digest.update(files_fingerprint([corpus_path]).encode("ascii"))
+    digest.update(json.dumps(vectorizer_params, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(part.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def featurize(corpus_path, vectorizer_params=VECTORIZER_PARAMS, cache_dir=FEATURE_CACHE_DIR,
+              rows=None, part="full", corpus=None):
+    """
+    (X, étiquettes, vectorizer, "hit" | "miss") : matrice TF-IDF du corpus,
+    ou de ses seules lignes rows (vectorizer ajusté sur elles), relue depuis
+    cache_dir si le corpus, les paramètres et part n'ont pas changé
+    part : nom de la partie (rows doit en découler : même part, mêmes lignes)
+    corpus : (textes, étiquettes) déjà lus, sinon relus en cas d'absence du cache
+    """
+    import joblib
+    import scipy.sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    key = _feature_key(corpus_path, vectorizer_params, part)
+    base = os.path.join(cache_dir, key) if cache_dir else None
+    if base and os.path.exists(base + ".npz"):
+        X = scipy.sparse.load_npz(base + ".npz")
+        with open(base + ".labels.json", encoding="utf-8") as f:
+            labels = json.load(f)
+        return X, labels, joblib.load(base + ".vectorizer.pkl"), "hit"
+
+    texts, labels = corpus or read_corpus(corpus_path)
+    if rows is not None:
+        texts = [texts[i] for i in rows]
+        labels = [labels[i] for i in rows]
+    vectorizer = TfidfVectorizer(**vectorizer_params)
+    X = vectorizer.fit_transform(texts).tocsr()
+
+    if base:
+        os.makedirs(cache_dir, exist_ok=True)
+        joblib.dump(vectorizer, base + ".vectorizer.pkl")
+        with open(base + ".labels.json", "w", encoding="utf-8") as f:
+            json.dump(labels, f)
+        # La matrice en dernier : sa présence signale une entrée complète
+        scipy.sparse.save_npz(base + ".npz", X)
+    return X, labels, vectorizer, "miss"
+
+
+# ============================================================================
+# ENTRAÎNEMENT
+# ============================================================================
+
+def train(corpus_path, output_dir=OUTPUT_DIR, n_jobs=N_JOBS, param_grid=PARAM_GRID,
+          cv=CV_FOLDS, cache_dir=FEATURE_CACHE_DIR, seed=SEED, verbose=True):
+    """
+    Entraîne, évalue et écrit modèle + vectorizer + manifeste dans output_dir
+    Retourne le manifeste
+    """
+    import joblib
+    import numpy as np
+    import sklearn
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import GridSearchCV, train_test_split
+
+    timings = {}
+    start = time.perf_counter()
+
+    # Part gardée de côté tirée avant tout TF-IDF : son vocabulaire et ses
+    # IDF n'entrent ni dans la recherche ni dans le score hold-out
+    texts, labels = read_corpus(corpus_path)
+    y = np.array(labels, dtype=object)
+    train_rows, test_rows = train_test_split(
+        np.arange(len(labels)), test_size=HOLDOUT_RATIO, stratify=y, random_state=seed)
+    X_train, _, split_vectorizer, cache = featurize(
+        corpus_path, VECTORIZER_PARAMS, cache_dir, rows=train_rows,
+        part=f"train-{seed}-{HOLDOUT_RATIO}", corpus=(texts, labels))
+    y_train, y_test = y[train_rows], y[test_rows]
+    X_test = split_vectorizer.transform([texts[i] for i in test_rows])
+    timings["featurize"] = time.perf_counter() - start
+    if verbose:
+        print(f"📊 {len(labels)} documents, {X_train.shape[1]} features sur la part "
+              f"d'entraînement (cache {cache}, {timings['featurize']:.2f}s)")
+
+    # Parallélisme au niveau de la recherche seulement : un cœur par
+    # ajustement (n_jobs de LogisticRegression est sans effet depuis sklearn 1.8)
+    step = time.perf_counter()
+    search = GridSearchCV(LogisticRegression(**MODEL_PARAMS), param_grid,
+                          cv=cv, scoring="f1_macro", n_jobs=n_jobs)
+    search.fit(X_train, y_train)
+    timings["search"] = time.perf_counter() - step
+    holdout = float(np.mean(search.predict(X_test) == y_test))
+    if verbose:
+        print(f"🔎 {len(search.cv_results_['params'])} combinaisons x {cv} plis "
+              f"({timings['search']:.2f}s) : {search.best_params_}, "
+              f"F1 macro {search.best_score_:.3f} (optimiste : vocabulaire commun aux plis), "
+              f"précision hold-out {holdout:.3f}")
+
+    # Modèle final et vectorizer sur tout le corpus, avec les meilleurs paramètres
+    step = time.perf_counter()
+    X, _, vectorizer, full_cache = featurize(corpus_path, VECTORIZER_PARAMS, cache_dir,
+                                             corpus=(texts, labels))
+    timings["featurize_full"] = time.perf_counter() - step
+    step = time.perf_counter()
+    model = LogisticRegression(**MODEL_PARAMS, **search.best_params_)
+    model.fit(X, y)
+    timings["refit"] = time.perf_counter() - step
+
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    vectorizer_path = os.path.join(output_dir, VECTORIZER_FILE)
+    joblib.dump(model, model_path)
+    joblib.dump(vectorizer, vectorizer_path)
+    timings["total"] = time.perf_counter() - start
+
+    classes, counts = np.unique(y, return_counts=True)
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": {
+            MODEL_FILE: files_fingerprint([model_path]),
+            VECTORIZER_FILE: files_fingerprint([vectorizer_path]),
+        },
+        "classes": [str(c) for c in model.classes_],
+        "corpus": {
+            "path": corpus_path,
+            "fingerprint": files_fingerprint([corpus_path]),
+            "documents": int(X.shape[0]),
+            "per_class": {str(c): int(n) for c, n in zip(classes, counts)},
+        },
+        "vectorizer_params": {k: list(v) if isinstance(v, tuple) else v
+                              for k, v in VECTORIZER_PARAMS.items()},
+        "model_params": MODEL_PARAMS,
+        "best_params": search.best_params_,
+        "cv_f1_macro": float(search.best_score_),
+        "cv_note": "folds share the training-split vocabulary and IDF (optimistic)",
+        "holdout_accuracy": holdout,
+        "holdout_note": "vectorizer fitted on the training split only",
+        "feature_cache": {"train": cache, "full": full_cache},
+        "n_jobs": n_jobs,
+        "sklearn": sklearn.__version__,
+        "timings": timings,
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+# ============================================================================
+# VÉRIFICATION AU CHARGEMENT
+# ============================================================================
+
+def check_manifest(manifest_path, model_path, vectorizer_path, classes=None):
+    """
+    Écarts entre le manifeste et les fichiers chargés (liste vide = conforme)
+    Les empreintes sont indexées par nom de fichier, comme à l'écriture
+    """
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return [f"format de manifeste inconnu : {manifest.get('format')}"]
+
+    problems = []
+    expected = manifest.get("files", {})
+    for path in (model_path, vectorizer_path):
+        name = os.path.basename(path)
+        if name not in expected:
+            problems.append(f"{name} absent du manifeste")
+        elif files_fingerprint([path]) != expected[name]:
+            problems.append(f"{name} ne correspond pas au manifeste")
+    if classes is not None and [str(c) for c in classes] != manifest.get("classes"):
+        problems.append("classes différentes de celles du manifeste")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entraînement du classifieur d'exercices")
+    parser.add_argument("corpus", help="corpus JSONL {text, label} ou CSV text,label")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="dossier des .pkl et du manifeste")
+    parser.add_argument("--n-jobs", type=int, default=N_JOBS)
+    parser.add_argument("--cache-dir", default=FEATURE_CACHE_DIR,
+                        help="cache de la matrice TF-IDF ('' pour désactiver)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--synthetic", action="store_true",
+                        help="écrit d'abord un corpus synthétique dans CORPUS")
+    parser.add_argument("--per-class", type=int, default=80,
+                        help="exemples par catégorie du corpus synthétique")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        count = synthetic_corpus(args.corpus, args.per_class, args.seed)
+        print(f"📝 Corpus synthétique : {count} exemples dans {args.corpus}")
+
+    manifest = train(args.corpus, args.output, args.n_jobs, cache_dir=args.cache_dir,
+                     seed=args.seed)
+    problems = check_manifest(os.path.join(args.output, MANIFEST_FILE),
+                              os.path.join(args.output, MODEL_FILE),
+                              os.path.join(args.output, VECTORIZER_FILE),
+                              manifest["classes"])
+    if problems:
+        print(f"❌ {problems}")
+        return 1
+    timings = ", ".join(f"{name} {value:.2f}s" for name, value in manifest["timings"].items())
+    print(f"✅ Modèle écrit dans {args.output}/ ({len(manifest['classes'])} classes ; {timings})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())